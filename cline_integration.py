@@ -2,20 +2,29 @@
 """
 Cline Integration for Elixir RAG System
 Provides Ollama-compatible API endpoints for context-aware code assistance
+
+Requests are served concurrently (one thread each). For anything beyond
+local use, run it under a WSGI server instead of the built-in one, e.g.:
+    gunicorn --workers 1 --threads 8 --bind 0.0.0.0:5001 cline_integration:app
+(one worker keeps a single copy of the embedding model in memory)
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from rag_system import ElixirRAG
 from vector_db import CodeVectorDB
 from embeddings import HybridCodeEmbedder
 import os
+import json
 import logging
-import traceback
+import threading
 import sys
 from datetime import datetime
 
-# Configure detailed logging
+# INFO by default; LOG_LEVEL=DEBUG for detail, LOG_REQUEST_BODIES=true to
+# also dump request headers/bodies (expensive - every request is re-serialized)
+LOG_REQUEST_BODIES = os.getenv('LOG_REQUEST_BODIES', '').lower() == 'true'
+
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout),
@@ -31,13 +40,37 @@ app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
 
+# Model is fixed for the life of the process - read it once
+MODEL_NAME = os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
+
+# /api/tags never changes either, so serialize it once at startup
+_TAGS_BODY = json.dumps({
+    "models": [
+        {
+            "name": MODEL_NAME,
+            "model": MODEL_NAME,
+            "modified_at": "2024-01-01T00:00:00Z",
+            "size": 2000000000,
+            "digest": "sha256:fake"
+        }
+    ]
+})
+
 # Global RAG system (lazy loading)
 rag_system = None
+_rag_lock = threading.Lock()
 
 def get_rag_system():
-    """Initialize RAG system on first use"""
+    """Initialize RAG system on first use (thread-safe)"""
     global rag_system
-    if rag_system is None:
+    if rag_system is not None:
+        return rag_system
+
+    # Concurrent first requests must not each load the embedding model
+    with _rag_lock:
+        if rag_system is not None:
+            return rag_system
+
         logger.info("🔧 Initializing RAG system...")
         try:
             logger.debug("Creating CodeVectorDB...")
@@ -48,14 +81,13 @@ def get_rag_system():
             embedder = HybridCodeEmbedder()
             logger.debug("HybridCodeEmbedder created successfully")
 
-            model_name = os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
-            logger.debug(f"Using model: {model_name}")
+            logger.debug("Using model: %s", MODEL_NAME)
 
             logger.debug("Creating ElixirRAG system...")
             rag_system = ElixirRAG(
                 vector_db=db,
                 embedder=embedder,
-                model=model_name
+                model=MODEL_NAME
             )
             logger.info("✅ RAG system ready!")
 
@@ -67,8 +99,7 @@ def get_rag_system():
                 logger.warning(f"Could not get database stats: {e}")
 
         except Exception as e:
-            logger.error(f"❌ Failed to initialize RAG system: {e}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception(f"❌ Failed to initialize RAG system: {e}")
             raise
     return rag_system
 
@@ -82,14 +113,13 @@ def health_check():
         logger.info(f"Health check successful: {stats}")
         response = jsonify({
             'status': 'ready',
-            'model': os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+            'model': MODEL_NAME,
             'database_stats': stats
         })
         response.headers['Content-Type'] = 'application/json'
         return response
     except Exception as e:
-        logger.error(f"❌ Health check failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Health check failed: {e}")
         error_response = jsonify({
             'status': 'error',
             'error': str(e)
@@ -102,29 +132,11 @@ def ollama_tags():
     """Ollama-compatible endpoint for model listing"""
     logger.info("🏷️ Model tags requested")
     try:
-        model_name = os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
-        logger.debug(f"Returning model: {model_name}")
-
-        response_data = {
-            "models": [
-                {
-                    "name": model_name,
-                    "model": model_name,
-                    "modified_at": "2024-01-01T00:00:00Z",
-                    "size": 2000000000,
-                    "digest": "sha256:fake"
-                }
-            ]
-        }
-
-        response = jsonify(response_data)
-        response.headers['Content-Type'] = 'application/json'
-        logger.debug("Model tags response sent successfully")
-        return response
+        logger.debug("Returning model: %s", MODEL_NAME)
+        return Response(_TAGS_BODY, mimetype='application/json')
 
     except Exception as e:
-        logger.error(f"❌ Model tags endpoint failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Model tags endpoint failed: {e}")
         error_response = jsonify({'error': str(e)})
         error_response.headers['Content-Type'] = 'application/json'
         return error_response, 500
@@ -135,10 +147,9 @@ def ollama_chat():
     logger.info("💬 Chat endpoint requested")
     try:
         data = request.json
-        logger.debug(f"Request data: {data}")
 
         messages = data.get('messages', [])
-        logger.debug(f"Messages received: {len(messages)} messages")
+        logger.debug("Messages received: %d messages", len(messages))
 
         if not messages:
             logger.warning("No messages provided in request")
@@ -146,11 +157,10 @@ def ollama_chat():
 
         # Get the last user message
         user_message = None
-        for i, msg in enumerate(reversed(messages)):
-            logger.debug(f"Message {i}: role={msg.get('role')}, content_length={len(msg.get('content', ''))}")
+        for msg in reversed(messages):
             if msg.get('role') == 'user':
                 user_message = msg.get('content', '')
-                logger.info(f"Found user message: {user_message[:100]}...")
+                logger.debug("Found user message: %.100s...", user_message)
                 break
 
         if not user_message:
@@ -160,7 +170,7 @@ def ollama_chat():
         logger.info("🤖 Processing query with RAG system...")
         rag = get_rag_system()
 
-        logger.debug(f"Querying with k=5, message length: {len(user_message)}")
+        logger.debug("Querying with k=5, message length: %d", len(user_message))
         answer = rag.query(
             question=user_message,
             k=5,
@@ -168,11 +178,11 @@ def ollama_chat():
             verbose=False
         )
 
-        logger.info(f"✅ Query processed, answer length: {len(answer)}")
-        logger.debug(f"Answer preview: {answer[:200]}...")
+        logger.info("✅ Query processed, answer length: %d", len(answer))
+        logger.debug("Answer preview: %.200s...", answer)
 
         response = {
-            "model": os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+            "model": MODEL_NAME,
             "created_at": datetime.now().isoformat(),
             "message": {
                 "role": "assistant",
@@ -187,8 +197,7 @@ def ollama_chat():
         return response
 
     except Exception as e:
-        logger.error(f"❌ Chat endpoint failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Chat endpoint failed: {e}")
         error_response = jsonify({'error': str(e)})
         error_response.headers['Content-Type'] = 'application/json'
         return error_response, 500
@@ -199,10 +208,9 @@ def ollama_generate():
     logger.info("🔧 Generate endpoint requested")
     try:
         data = request.json
-        logger.debug(f"Generate request data: {data}")
 
         prompt = data.get('prompt', '')
-        logger.debug(f"Prompt length: {len(prompt)}")
+        logger.debug("Prompt length: %d", len(prompt))
 
         if not prompt:
             logger.warning("No prompt provided in generate request")
@@ -211,7 +219,7 @@ def ollama_generate():
         logger.info("🤖 Processing generation with RAG system...")
         rag = get_rag_system()
 
-        logger.debug(f"Querying with k=5, prompt length: {len(prompt)}")
+        logger.debug("Querying with k=5, prompt length: %d", len(prompt))
         answer = rag.query(
             question=prompt,
             k=5,
@@ -219,11 +227,11 @@ def ollama_generate():
             verbose=False
         )
 
-        logger.info(f"✅ Generation processed, answer length: {len(answer)}")
-        logger.debug(f"Answer preview: {answer[:200]}...")
+        logger.info("✅ Generation processed, answer length: %d", len(answer))
+        logger.debug("Answer preview: %.200s...", answer)
 
         response = {
-            "model": os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+            "model": MODEL_NAME,
             "created_at": datetime.now().isoformat(),
             "response": answer,
             "done": True
@@ -235,8 +243,7 @@ def ollama_generate():
         return response
 
     except Exception as e:
-        logger.error(f"❌ Generate endpoint failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Generate endpoint failed: {e}")
         error_response = jsonify({'error': str(e)})
         error_response.headers['Content-Type'] = 'application/json'
         return error_response, 500
@@ -251,14 +258,13 @@ def get_stats():
         logger.info(f"Database stats retrieved: {stats}")
         response = jsonify({
             'database_stats': stats,
-            'model': os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+            'model': MODEL_NAME,
             'total_points': stats.get('total_points', 0)
         })
         response.headers['Content-Type'] = 'application/json'
         return response
     except Exception as e:
-        logger.error(f"❌ Stats endpoint failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Stats endpoint failed: {e}")
         error_response = jsonify({'error': str(e)})
         error_response.headers['Content-Type'] = 'application/json'
         return error_response, 500
@@ -266,16 +272,16 @@ def get_stats():
 # Add request logging middleware
 @app.before_request
 def log_request_info():
-    logger.debug(f"Request: {request.method} {request.url}")
-    logger.debug(f"Headers: {dict(request.headers)}")
-    # Only try to log JSON data for POST/PUT requests
-    if request.method in ['POST', 'PUT'] and request.is_json:
-        logger.debug(f"JSON data: {request.json}")
+    logger.debug("Request: %s %s", request.method, request.url)
+    if LOG_REQUEST_BODIES:
+        logger.debug("Headers: %s", dict(request.headers))
+        # Only try to log JSON data for POST/PUT requests
+        if request.method in ['POST', 'PUT'] and request.is_json:
+            logger.debug("JSON data: %s", request.json)
 
 @app.after_request
 def log_response_info(response):
-    logger.debug(f"Response status: {response.status_code}")
-    logger.debug(f"Response size: {len(response.get_data())} bytes")
+    logger.debug("Response status: %s, size: %s bytes", response.status_code, response.content_length)
     return response
 
 if __name__ == '__main__':
@@ -292,8 +298,7 @@ if __name__ == '__main__':
 
     try:
         logger.info("🌐 Starting Flask server on 0.0.0.0:5001...")
-        app.run(host='0.0.0.0', port=5001, debug=False)
+        app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
     except Exception as e:
-        logger.error(f"❌ Failed to start server: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"❌ Failed to start server: {e}")
         sys.exit(1)
@@ -11,11 +11,35 @@ Features:
 - Overlaps intelligently at semantic boundaries
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
+import mmap
+import os
 import re
 
 
+@dataclass(slots=True)
+class Chunk:
+    """
+    One chunk of source code plus the metadata stored alongside it
+
+    Slotted: every chunk has the same fields, so there is no per-instance
+    dict (roughly a quarter of the memory of the equivalent dict).
+    """
+    text: str
+    file: str
+    repo: str
+    type: str
+    module: Optional[str] = None
+    functions: Optional[List[str]] = None
+    metadata: Optional[Dict] = None
+    line_start: Optional[int] = None
+    line_end: Optional[int] = None
+
+
 class ElixirCodeChunker:
     """
     Chunks Elixir code intelligently:
@@ -24,60 +48,121 @@ class ElixirCodeChunker:
     - Includes relevant context (module docs, type specs)
     - Overlaps intelligently at semantic boundaries
     """
+
+    # One token stream for the whole file. Comments, strings, heredocs,
+    # sigils, char literals and atoms are matched only so that keywords
+    # inside them are skipped; the `kw` group drives the block tracking.
+    _TOKEN_RE = re.compile(r'''
+          \#[^\n]*
+        | ~[a-zA-Z](?:"{3}[\s\S]*?"{3}|'{3}[\s\S]*?'{3})
+        | "{3}[\s\S]*?"{3}
+        | '{3}[\s\S]*?'{3}
+        | ~[a-zA-Z](?:\([^)\n]*\)|\[[^\]\n]*\]|\{[^}\n]*\}|<[^>\n]*>|/(?:\\.|[^/\\\n])*/|\|(?:\\.|[^|\\\n])*\||"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+        | "(?:\\.|[^"\\])*"
+        | '(?:\\.|[^'\\\n])*'
+        | \?(?:\\.|[^\s\\])
+        | :[a-zA-Z_]\w*[?!]?
+        | (?<![\w.:@])(?P<kw>defmodule|defp|def|do|end|fn)(?![\w?!:])
+    ''', re.VERBOSE)
+    _MODULE_NAME_RE = re.compile(r'\s+([A-Z][A-Za-z0-9_.]*)')
+    _MODULEDOC_RE = re.compile(r'@moduledoc\s+"""(.*?)"""', re.DOTALL)
+    # Plain string prefixes - these run once per line / per function
+    _DEF_PREFIXES = ('def ', 'defp ', 'def\t', 'defp\t')
     
     def __init__(self, max_chunk_size: int = 1000, overlap: int = 200):
         self.max_chunk_size = max_chunk_size
         self.overlap = overlap
     
     def extract_modules(self, code: str) -> List[Dict]:
-        """Extract all modules from Elixir file"""
+        """
+        Extract all top-level modules from Elixir file in a single pass.
+
+        Walks the token stream once, keeping a stack of open `do`/`fn`
+        blocks (every `end` closes the nearest one). Each module carries
+        the (start, end) offsets of its def/defp functions.
+        """
         modules = []
+        stack = []       # open blocks: [kind, start, module]
+        pending = None   # defmodule/def/defp still waiting for its `do`
         
-        # Pattern to find defmodule blocks
-        module_pattern = r'defmodule\s+([A-Z][A-Za-z0-9_.]*)\s+do(.*?)(?=\ndefmodule|\Z)'
-        
-        matches = re.finditer(module_pattern, code, re.DOTALL)
-        
-        for match in matches:
-            module_name = match.group(1)
-            module_content = match.group(2)
+        for match in self._TOKEN_RE.finditer(code):
+            kw = match.group('kw')
+            if kw is None:
+                continue
+            
+            if pending is not None:
+                if kw == 'do':
+                    stack.append(pending)
+                    pending = None
+                    continue
+                # No do-block: `def name(args), do: expr` style one-liner
+                if pending[0] == 'function':
+                    pending[2]['functions'].append(
+                        (pending[1], self._inline_end(code, pending[1]))
+                    )
+                pending = None
             
-            modules.append({
-                'name': module_name,
-                'content': match.group(0),
-                'start': match.start(),
-                'end': match.end()
-            })
+            if kw == 'defmodule':
+                if stack:
+                    pending = ['block', match.start(), None]
+                else:
+                    name = self._MODULE_NAME_RE.match(code, match.end())
+                    pending = ['module', match.start(), {
+                        'name': name.group(1) if name else '',
+                        'start': match.start(),
+                        'end': len(code),
+                        'functions': []
+                    }]
+            elif kw in ('def', 'defp'):
+                module = stack[0][2] if stack and stack[0][0] == 'module' else None
+                if module is not None and all(frame[0] != 'function' for frame in stack):
+                    pending = ['function', match.start(), module]
+                else:
+                    pending = ['block', match.start(), None]
+            elif kw in ('do', 'fn'):
+                stack.append(['block', match.start(), None])
+            elif stack:  # end
+                self._close_block(stack.pop(), match.end(), modules)
         
-        return modules
-    
-    def extract_functions(self, module_content: str) -> List[Dict]:
-        """Extract functions from module"""
-        functions = []
+        if pending is not None and pending[0] == 'function':
+            pending[2]['functions'].append((pending[1], self._inline_end(code, pending[1])))
         
-        # Patterns for different function types
-        patterns = [
-            r'(def\s+\w+[^)]*\).*?(?=\n\s*def|\n\s*defp|\n\s*end|\Z))',
-            r'(defp\s+\w+[^)]*\).*?(?=\n\s*def|\n\s*defp|\n\s*end|\Z))',
-        ]
+        # Unbalanced source: close whatever is still open at end of file
+        while stack:
+            self._close_block(stack.pop(), len(code), modules)
         
-        for pattern in patterns:
-            matches = re.finditer(pattern, module_content, re.DOTALL)
-            for match in matches:
-                functions.append({
-                    'content': match.group(0),
-                    'start': match.start(),
-                    'end': match.end()
-                })
+        for module in modules:
+            module['content'] = code[module['start']:module['end']]
         
-        return functions
+        return modules
+    
+    @staticmethod
+    def _close_block(frame: list, end: int, modules: List[Dict]):
+        """Record the span of a closed module or function block"""
+        kind, start, module = frame
+        if kind == 'module':
+            module['end'] = end
+            modules.append(module)
+        elif kind == 'function':
+            module['functions'].append((start, end))
     
-    def chunk_file(self, file_path: str, repo_name: str = "") -> List[Dict]:
+    @staticmethod
+    def _inline_end(code: str, start: int) -> int:
+        """End offset of a one-line def, following `,` / `do:` continuations"""
+        end = code.find('\n', start)
+        while end != -1:
+            next_end = code.find('\n', end + 1)
+            next_line = code[end + 1:next_end if next_end != -1 else len(code)]
+            if not (code[start:end].rstrip().endswith(',') or next_line.lstrip().startswith('do:')):
+                return end
+            end = next_end
+        return len(code)
+    
+    def chunk_file(self, file_path: str, repo_name: str = "") -> List[Chunk]:
         """
         Main chunking method - creates semantic chunks from Elixir file
         """
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            code = f.read()
+        code = self._read_source(file_path)
         
         chunks = []
         
@@ -98,8 +183,8 @@ class ElixirCodeChunker:
             # Get module documentation
             module_doc = self._extract_moduledoc(module_content)
             
-            # Extract functions from module
-            functions = self.extract_functions(module_content)
+            # Function spans were collected during the same scan
+            functions = module['functions']
             
             # Strategy: Create chunks that include:
             # 1. Module context (name + doc)
@@ -108,78 +193,96 @@ class ElixirCodeChunker:
             
             if len(module_content) <= self.max_chunk_size:
                 # Small module - one chunk
-                chunks.append({
-                    'text': module_content,
-                    'module': module_name,
-                    'file': file_path,
-                    'repo': repo_name,
-                    'type': 'module',
-                    'metadata': {
+                chunks.append(Chunk(
+                    text=module_content,
+                    module=module_name,
+                    file=file_path,
+                    repo=repo_name,
+                    type='module',
+                    metadata={
                         'has_docs': bool(module_doc),
                         'function_count': len(functions)
                     }
-                })
+                ))
             else:
                 # Large module - chunk by functions with module context
                 module_header = self._get_module_header(module_content)
                 
-                current_chunk = module_header
+                # Parts are joined once per finished chunk; repeated str +=
+                # is quadratic on big generated modules
+                current_parts = [module_header]
+                current_len = len(module_header)
                 current_functions = []
                 
-                for func in functions:
-                    func_content = func['content']
+                for func_start, func_end in functions:
+                    func_content = code[func_start:func_end]
                     
                     # Check if adding this function exceeds chunk size
-                    if len(current_chunk) + len(func_content) > self.max_chunk_size:
+                    if current_len + len(func_content) > self.max_chunk_size:
                         # Save current chunk
                         if current_functions:
-                            chunks.append({
-                                'text': current_chunk,
-                                'module': module_name,
-                                'file': file_path,
-                                'repo': repo_name,
-                                'type': 'module_section',
-                                'functions': current_functions,
-                                'metadata': {
+                            chunks.append(Chunk(
+                                text="".join(current_parts),
+                                module=module_name,
+                                file=file_path,
+                                repo=repo_name,
+                                type='module_section',
+                                functions=current_functions,
+                                metadata={
                                     'has_docs': bool(module_doc),
                                     'function_count': len(current_functions)
                                 }
-                            })
+                            ))
                         
                         # Start new chunk with module header + overlap
-                        current_chunk = module_header
+                        current_parts = [module_header]
+                        current_len = len(module_header)
                         # Add last function from previous chunk for context
                         if current_functions:
                             last_func = current_functions[-1]
-                            current_chunk += f"\n\n  # ... (previous function: {last_func})\n\n"
+                            overlap = f"\n\n  # ... (previous function: {last_func})\n\n"
+                            current_parts.append(overlap)
+                            current_len += len(overlap)
                         
                         current_functions = []
                     
-                    current_chunk += "\n\n" + func_content
+                    current_parts.append("\n\n")
+                    current_parts.append(func_content)
+                    current_len += len(func_content) + 2
                     func_name = self._extract_function_name(func_content)
-                    if func_name:
+                    # Multi-clause functions (def f(0), def f(n)) list once
+                    if func_name and func_name not in current_functions:
                         current_functions.append(func_name)
                 
                 # Add remaining chunk
                 if current_functions:
-                    chunks.append({
-                        'text': current_chunk,
-                        'module': module_name,
-                        'file': file_path,
-                        'repo': repo_name,
-                        'type': 'module_section',
-                        'functions': current_functions,
-                        'metadata': {
+                    chunks.append(Chunk(
+                        text="".join(current_parts),
+                        module=module_name,
+                        file=file_path,
+                        repo=repo_name,
+                        type='module_section',
+                        functions=current_functions,
+                        metadata={
                             'has_docs': bool(module_doc),
                             'function_count': len(current_functions)
                         }
-                    })
+                    ))
         
         return chunks
     
+    @staticmethod
+    def _read_source(file_path: str) -> str:
+        """Read a source file through mmap (one read of the page cache)"""
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""  # mmap refuses empty files
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:].decode('utf-8', errors='ignore')
+    
     def _extract_moduledoc(self, content: str) -> str:
         """Extract @moduledoc"""
-        match = re.search(r'@moduledoc\s+"""(.*?)"""', content, re.DOTALL)
+        match = self._MODULEDOC_RE.search(content)
         return match.group(1).strip() if match else ""
     
     def _get_module_header(self, module_content: str) -> str:
@@ -192,7 +295,7 @@ class ElixirCodeChunker:
             if in_header:
                 header_lines.append(line)
                 # Stop at first def/defp
-                if re.match(r'\s*(def|defp)\s+', line):
+                if line.lstrip().startswith(self._DEF_PREFIXES):
                     in_header = False
                     break
         
@@ -200,10 +303,14 @@ class ElixirCodeChunker:
     
     def _extract_function_name(self, func_content: str) -> str:
         """Extract function name from def/defp"""
-        match = re.match(r'\s*(?:def|defp)\s+(\w+)', func_content)
-        return match.group(1) if match else None
+        parts = func_content.lstrip().split(None, 2)
+        if len(parts) < 2 or parts[0] not in ('def', 'defp'):
+            return None
+        # "name(args)", "name," (one-liner) or "name" (no parens)
+        name = parts[1].partition('(')[0].partition(',')[0]
+        return name or None
     
-    def _chunk_by_lines(self, code: str, file_path: str, repo_name: str) -> List[Dict]:
+    def _chunk_by_lines(self, code: str, file_path: str, repo_name: str) -> List[Chunk]:
         """Fallback: chunk by lines with overlap"""
         lines = code.split('\n')
         chunks = []
@@ -215,25 +322,129 @@ class ElixirCodeChunker:
             chunk_text = '\n'.join(chunk_lines)
             
             if chunk_text.strip():
-                chunks.append({
-                    'text': chunk_text,
-                    'file': file_path,
-                    'repo': repo_name,
-                    'type': 'text_chunk',
-                    'line_start': i,
-                    'line_end': min(i + self.max_chunk_size, len(lines))
-                })
+                chunks.append(Chunk(
+                    text=chunk_text,
+                    file=file_path,
+                    repo=repo_name,
+                    type='text_chunk',
+                    line_start=i,
+                    line_end=min(i + self.max_chunk_size, len(lines))
+                ))
         
         return chunks
 
 
-def chunk_repository(repo_path: str, repo_name: str = None) -> List[Dict]:
+# Below this many files the process pool costs more than it saves
+_PARALLEL_MIN_FILES = 32
+
+# Files per pool task, and tasks in flight per worker. Results are only
+# produced this far ahead of the consumer, so memory stays bounded even
+# when embedding is much slower than chunking
+_TASK_FILES = 16
+_TASKS_PER_WORKER = 2
+
+_worker_chunker = None
+
+
+def _init_worker(max_chunk_size: int, overlap: int):
+    """Build one chunker per worker process"""
+    global _worker_chunker
+    _worker_chunker = ElixirCodeChunker(max_chunk_size=max_chunk_size, overlap=overlap)
+
+
+def _chunk_file_safe(chunker: ElixirCodeChunker, file_path: str, repo_name: str) -> Tuple[str, List[Chunk], Optional[str]]:
+    """Chunk one file, returning the error instead of raising"""
+    try:
+        return file_path, chunker.chunk_file(file_path, repo_name), None
+    except Exception as e:
+        return file_path, [], str(e)
+
+
+def _chunk_files_worker(pairs: List[Tuple[str, str]]) -> List[Tuple[str, List[Chunk], Optional[str]]]:
+    """Process pool entry point (must be a top-level function to pickle)"""
+    return [_chunk_file_safe(_worker_chunker, *args) for args in pairs]
+
+
+def chunk_files(
+    file_paths: List[str],
+    repo_name: str = "",
+    chunker: ElixirCodeChunker = None,
+    max_workers: int = None
+) -> Iterator[Tuple[str, List[Chunk], Optional[str]]]:
+    """
+    Chunk files in parallel across a process pool
+    
+    Args:
+        file_paths: Files to chunk
+        repo_name: Repository name stored on every chunk
+        chunker: Chunker whose settings the workers copy (optional)
+        max_workers: Worker processes (default: CPU count, 1 = serial)
+    
+    Yields:
+        (file_path, chunks, error) per file, in input order
+    """
+    yield from _chunk_file_repo_pairs(
+        [(str(f), repo_name) for f in file_paths],
+        chunker,
+        max_workers
+    )
+
+
+def _chunk_file_repo_pairs(
+    pairs: List[Tuple[str, str]],
+    chunker: ElixirCodeChunker = None,
+    max_workers: int = None
+) -> Iterator[Tuple[str, List[Chunk], Optional[str]]]:
+    """Chunk (file_path, repo_name) pairs, in a process pool when worthwhile"""
+    if chunker is None:
+        chunker = ElixirCodeChunker(max_chunk_size=1000, overlap=200)
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    
+    if max_workers == 1 or len(pairs) < _PARALLEL_MIN_FILES:
+        for file_path, repo_name in pairs:
+            yield _chunk_file_safe(chunker, file_path, repo_name)
+        return
+    
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(chunker.max_chunk_size, chunker.overlap)
+    ) as executor:
+        # Sliding window instead of executor.map, which submits every file
+        # up front and buffers all results however slowly they are consumed
+        tasks = (pairs[i:i + _TASK_FILES] for i in range(0, len(pairs), _TASK_FILES))
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_chunk_files_worker, task))
+            if len(pending) >= max_workers * _TASKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def find_elixir_files(repo_path: str) -> List[Path]:
+    """
+    Find .ex/.exs files in one directory walk
+    
+    test/ directories are pruned during the walk instead of filtering
+    paths afterwards (remove the prune to index tests too).
+    """
+    elixir_files = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d != 'test']
+        elixir_files.extend(Path(root, name) for name in files if name.endswith(('.ex', '.exs')))
+    return elixir_files
+
+
+def chunk_repository(repo_path: str, repo_name: str = None, max_workers: int = None) -> List[Chunk]:
     """
     Chunk entire repository
     
     Args:
         repo_path: Path to repository
         repo_name: Name of repository (optional, will use directory name)
+        max_workers: Worker processes for chunking (default: CPU count)
     
     Returns:
         List of code chunks with metadata
@@ -244,21 +455,45 @@ def chunk_repository(repo_path: str, repo_name: str = None) -> List[Dict]:
     chunker = ElixirCodeChunker(max_chunk_size=1000, overlap=200)
     all_chunks = []
     
-    # Find all Elixir files
-    elixir_files = list(Path(repo_path).rglob('*.ex')) + list(Path(repo_path).rglob('*.exs'))
-    
-    # Skip test files for now (optional - comment out if you want tests)
-    elixir_files = [f for f in elixir_files if '/test/' not in str(f)]
+    # Find all Elixir files (test/ directories skipped)
+    elixir_files = find_elixir_files(repo_path)
     
     print(f"Found {len(elixir_files)} Elixir files in {repo_name}")
     
-    for file_path in elixir_files:
-        try:
-            chunks = chunker.chunk_file(str(file_path), repo_name)
-            all_chunks.extend(chunks)
-        except Exception as e:
-            print(f"Error chunking {file_path}: {e}")
+    for file_path, chunks, error in chunk_files(elixir_files, repo_name, chunker, max_workers):
+        if error:
+            print(f"Error chunking {file_path}: {error}")
             continue
+        all_chunks.extend(chunks)
     
     print(f"Created {len(all_chunks)} chunks from {repo_name}")
     return all_chunks
+
+
+def chunk_repositories(repo_paths: List[str], max_workers: int = None) -> Iterator[Chunk]:
+    """
+    Chunk several repositories through one shared process pool
+    
+    Files from all repositories go into a single pool, so workers start
+    once and small repositories don't run serially one after another.
+    Each repository is named after its directory.
+    
+    Args:
+        repo_paths: Paths to repositories
+        max_workers: Worker processes for chunking (default: CPU count)
+    
+    Yields:
+        Code chunks, repository by repository
+    """
+    pairs = []
+    for repo_path in repo_paths:
+        repo_name = Path(repo_path).name
+        elixir_files = find_elixir_files(repo_path)
+        print(f"Found {len(elixir_files)} Elixir files in {repo_name}")
+        pairs.extend((str(f), repo_name) for f in elixir_files)
+    
+    for file_path, chunks, error in _chunk_file_repo_pairs(pairs, max_workers=max_workers):
+        if error:
+            print(f"Error chunking {file_path}: {error}")
+            continue
+        yield from chunks
@@ -11,11 +11,145 @@ The code-specific model understands:
 - Programming syntax and semantics
 - Function signatures and documentation
 - Code structure and patterns
+
+All vectors are L2-normalized at encode time, so cosine similarity is a
+plain dot product downstream.
 """
 
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from code_chunker import Chunk
+from collections import OrderedDict
+from typing import List, Dict, Optional
+import hashlib
+import os
+import sqlite3
+import threading
 import numpy as np
+import torch
+
+# Default location for HybridCodeEmbedder(persist_path=...)
+EMBED_CACHE_PATH = os.path.join("qdrant_data", "embed_cache.sqlite")
+
+# Optional: hand-written SIMD similarity kernels (runtime CPU dispatch)
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+# Optional: JIT-compiled similarity kernel, NumPy fallback otherwise
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    # Pinned signature + cache=True: compiled once, then loaded from
+    # __pycache__ on later imports instead of re-JITting at first call
+    @njit('f4[::1](f4[:, ::1], f4[::1])', fastmath=True, parallel=True, cache=True)
+    def _batch_dot_kernel(matrix, query):
+        n, d = matrix.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += matrix[i, j] * query[j]
+            out[i] = acc
+        return out
+
+
+def batch_dot(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Dot product of every row of matrix with query
+    
+    For normalized embeddings this is cosine similarity. Uses SimSIMD's
+    kernels (picked for the CPU at runtime) when installed, then a
+    parallel Numba loop, then NumPy.
+    
+    Args:
+        matrix: (n, d) array of vectors
+        query: (d,) query vector
+        
+    Returns:
+        (n,) float32 similarities
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    query = np.ascontiguousarray(query, dtype=np.float32)
+    if SIMSIMD_AVAILABLE:
+        return np.asarray(simsimd.cdist(query[None, :], matrix, metric="dot"), dtype=np.float32).ravel()
+    if NUMBA_AVAILABLE:
+        return _batch_dot_kernel(matrix, query)
+    return matrix @ query
+
+
+class EmbeddingStore:
+    """
+    Persistent key -> embedding cache in a single SQLite file
+    
+    Sits behind the in-memory LRU of HybridCodeEmbedder.encode(), so
+    repeated queries skip the forward pass across process restarts
+    (Streamlit reloads, new CLI sessions), not just within one process.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file (parent directories are created)
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """Stored vector for key, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Stored vectors for whichever keys are present"""
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+    
+    def put(self, key: bytes, vector: np.ndarray):
+        """Store a float32 vector under key"""
+        self.put_many([key], [vector])
+    
+    def put_many(self, keys: List[bytes], vectors):
+        """Store float32 vectors under keys, in one transaction"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in zip(keys, vectors)
+                ]
+            )
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
 
 
 class HybridCodeEmbedder:
@@ -29,63 +163,188 @@ class HybridCodeEmbedder:
     This gives better retrieval for both code and documentation.
     """
     
-    def __init__(self, model_name: str = None):
+    # Functions named in the metadata prefix; the code itself carries the rest
+    MAX_PREFIX_FUNCTIONS = 5
+    
+    def __init__(
+        self,
+        model_name: str = None,
+        cache_size: int = 1024,
+        max_seq_length: int = 512,
+        backend: str = None,
+        persist_path: str = None
+    ):
         """
         Initialize embedding model
         
         Args:
             model_name: Specific model to use (optional)
                        Default tries Jina Code, falls back to MiniLM
+            cache_size: Max texts kept in the encode() LRU cache (0 disables)
+            max_seq_length: Token cap per text (Jina accepts 8192, but chunks
+                           are ~1000 chars and attention cost is quadratic)
+            backend: Inference backend on CPU: 'torch', 'onnx' or 'openvino'
+                    (default: EMBEDDING_BACKEND env var, else 'torch').
+                    The GPU always uses torch in fp16.
+            persist_path: SQLite file that keeps encode() and encode_chunks()
+                         results across restarts, so re-indexing only embeds
+                         changed chunks (optional, e.g. "qdrant_data/embed_cache.sqlite")
         """
         print("Loading embedding models...")
         
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        if self.device == 'cuda':
+            self.backend = 'torch'
+        else:
+            self.backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
+        
         if model_name:
-            self.code_encoder = SentenceTransformer(model_name)
+            self.code_encoder = self._load_model(model_name)
             print(f"✓ Loaded {model_name}")
         else:
             # Try code-specific model first
             try:
-                self.code_encoder = SentenceTransformer('jinaai/jina-embeddings-v2-base-code')
+                model_name = 'jinaai/jina-embeddings-v2-base-code'
+                self.code_encoder = self._load_model(model_name)
                 print("✓ Loaded Jina Code Embeddings (768 dims)")
             except Exception as e:
                 print(f"⚠ Jina model not available ({e}), using MiniLM")
-                self.code_encoder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+                model_name = 'sentence-transformers/all-MiniLM-L6-v2'
+                self.code_encoder = self._load_model(model_name)
                 print("✓ Loaded MiniLM Embeddings (384 dims)")
+        self.model_name = model_name
+        
+        if self.device == 'cuda':
+            # fp16 halves GPU memory, so bigger batches fit
+            self.code_encoder = self.code_encoder.half()
+            self.default_batch_size = 128
+            print("✓ Running on GPU (fp16)")
+        else:
+            self.default_batch_size = 32
+        # EMBED_BATCH overrides the per-device default
+        self.default_batch_size = int(os.getenv('EMBED_BATCH', self.default_batch_size))
+        
+        if max_seq_length and self.code_encoder.max_seq_length > max_seq_length:
+            self.code_encoder.max_seq_length = max_seq_length
         
         self.embedding_dim = self.code_encoder.get_sentence_embedding_dimension()
         print(f"Embedding dimension: {self.embedding_dim}")
+        
+        # Exact-match LRU for encode(): repeated queries skip the forward pass
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Optional on-disk layer behind the LRU
+        self.store = EmbeddingStore(persist_path) if persist_path else None
+        self.disk_hits = 0
+        # encode_chunks() vectors reused from the store vs. computed
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+    
+    def _load_model(self, name: str) -> SentenceTransformer:
+        """
+        Load a model on the configured backend
+        
+        ONNX Runtime / OpenVINO need the optimum extras
+        (pip install "sentence-transformers[onnx]"); the first load exports
+        the model. If that fails we fall back to torch rather than not
+        starting at all.
+        """
+        if self.backend != 'torch':
+            try:
+                model = SentenceTransformer(name, device=self.device, backend=self.backend)
+                print(f"✓ Using {self.backend} backend")
+                return model
+            except Exception as e:
+                print(f"⚠ {self.backend} backend not available ({e}), using torch")
+                self.backend = 'torch'
+        return SentenceTransformer(name, device=self.device)
     
     def encode(self, text: str) -> np.ndarray:
         """
         Encode single text
         
+        Results are cached by SHA-256 of the model name and text, so
+        asking the same question twice only runs the model once (in
+        memory, and on disk when persist_path is set). Cached vectors
+        are read-only; copy before modifying.
+        
         Args:
             text: Text to encode
             
         Returns:
-            Embedding vector
+            Normalized embedding vector
         """
-        return self.code_encoder.encode(text, convert_to_numpy=True)
+        key = hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).digest()
+        
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return vector
+        
+        vector = self.store.get(key) if self.store is not None else None
+        if vector is not None:
+            with self._cache_lock:
+                self.disk_hits += 1
+        else:
+            with self._cache_lock:
+                self.cache_misses += 1
+            vector = self._as_float32(
+                self.code_encoder.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+            )
+            if self.store is not None:
+                self.store.put(key, vector)
+        
+        if self.cache_size > 0:
+            vector.setflags(write=False)
+            with self._cache_lock:
+                self._cache[key] = vector
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        return vector
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the encode() cache (disk hits count as hits)"""
+        hits = self.cache_hits + self.disk_hits
+        total = hits + self.cache_misses
+        return {
+            'size': len(self._cache),
+            'hits': self.cache_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.cache_misses,
+            'hit_rate': hits / total if total else 0.0,
+            # encode_chunks() reuse from the persistent store
+            'chunk_hit_rate': self.chunk_hits / max(self.chunk_hits + self.chunk_misses, 1)
+        }
     
-    def encode_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    def encode_batch(self, texts: List[str], batch_size: int = None) -> np.ndarray:
         """
         Encode multiple texts efficiently
         
         Args:
             texts: List of texts to encode
-            batch_size: Batch size for encoding
+            batch_size: Batch size for encoding (default: EMBED_BATCH env var,
+                       else 128 on GPU, 32 on CPU)
             
         Returns:
-            Array of embedding vectors
+            Array of normalized embedding vectors
         """
-        return self.code_encoder.encode(
+        return self._as_float32(self.code_encoder.encode(
             texts, 
-            batch_size=batch_size,
+            batch_size=batch_size or self.default_batch_size,
             show_progress_bar=True,
-            convert_to_numpy=True
-        )
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ))
     
-    def encode_chunk(self, chunk: Dict) -> np.ndarray:
+    def encode_chunk(self, chunk: Chunk) -> np.ndarray:
         """
         Encode a code chunk with metadata enhancement
         
@@ -93,25 +352,93 @@ class HybridCodeEmbedder:
         This helps match queries like "permission module" to the right code
         
         Args:
-            chunk: Code chunk dictionary with metadata
+            chunk: Code chunk with metadata
             
         Returns:
             Embedding vector
         """
-        text = chunk['text']
+        return self.encode(self._enhance_text(chunk))
+    
+    def encode_chunks(self, chunks: List[Chunk], batch_size: int = None) -> np.ndarray:
+        """
+        Encode many code chunks in one batched forward pass
+        
+        Same metadata enhancement as encode_chunk, but tokenization and
+        inference are amortized over the whole batch. Chunks whose
+        enhanced text is identical (generated code, repeated boilerplate)
+        are encoded once and share the vector. With persist_path set,
+        chunks already embedded by an earlier run - including ones that
+        only differ in whitespace, e.g. after `mix format` - are read
+        from the store instead.
+        
+        Args:
+            chunks: Code chunks with metadata
+            batch_size: Batch size for encoding (default: EMBED_BATCH env var,
+                       else 128 on GPU, 32 on CPU)
+            
+        Returns:
+            Array of normalized embedding vectors
+        """
+        unique_index = {}
+        inverse = np.empty(len(chunks), dtype=np.intp)
+        for i, chunk in enumerate(chunks):
+            inverse[i] = unique_index.setdefault(self._enhance_text(chunk), len(unique_index))
+        
+        texts = list(unique_index)
+        vectors = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        
+        keys = [self._chunk_key(text) for text in texts] if self.store is not None else []
+        stored = self.store.get_many(keys) if keys else {}
+        todo = [i for i in range(len(texts)) if not keys or keys[i] not in stored]
+        for i, key in enumerate(keys):
+            if key in stored:
+                vectors[i] = stored[key]
+        
+        if todo:
+            vectors[todo] = self._as_float32(self.code_encoder.encode(
+                [texts[i] for i in todo],
+                batch_size=batch_size or self.default_batch_size,
+                show_progress_bar=True,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ))
+            if keys:
+                self.store.put_many([keys[i] for i in todo], vectors[todo])
+        
+        if keys:
+            self.chunk_hits += len(texts) - len(todo)
+            self.chunk_misses += len(todo)
+            print(f"  ({len(texts) - len(todo)}/{len(texts)} embeddings reused from {self.store.path})")
+        
+        if len(unique_index) < len(chunks):
+            print(f"  ({len(chunks) - len(unique_index)} duplicate chunks reused an embedding)")
+        
+        return vectors[inverse]
+    
+    def _chunk_key(self, text: str) -> bytes:
+        """Store key for a chunk: whitespace-only edits map to the same key"""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"chunk\0{self.model_name}\0{normalized}".encode('utf-8')).digest()
+    
+    @staticmethod
+    def _as_float32(vectors: np.ndarray) -> np.ndarray:
+        """fp16 models return fp16 arrays; everything downstream expects float32"""
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def _enhance_text(self, chunk: Chunk) -> str:
+        """Prefix chunk text with module/function metadata"""
+        text = chunk.text
         
         # Enhance with metadata
         prefix = ""
-        if 'module' in chunk:
-            prefix += f"Module: {chunk['module']}\n"
-        if 'functions' in chunk:
-            prefix += f"Functions: {', '.join(chunk['functions'])}\n"
-        if chunk.get('type') == 'module':
+        if chunk.module is not None:
+            prefix += f"Module: {chunk.module}\n"
+        if chunk.functions is not None:
+            prefix += f"Functions: {', '.join(chunk.functions[:self.MAX_PREFIX_FUNCTIONS])}\n"
+        if chunk.type == 'module':
             prefix += "Type: Complete Module\n"
         
-        enhanced_text = prefix + "\n" + text if prefix else text
-        
-        return self.encode(enhanced_text)
+        return prefix + "\n" + text if prefix else text
 
 
 # Example usage
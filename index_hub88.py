@@ -12,22 +12,75 @@ Before running:
 3. Install dependencies: pip install -r requirements.txt
 """
 
-from code_chunker import chunk_repository
-from embeddings import HybridCodeEmbedder
+from code_chunker import Chunk, chunk_repositories
+from embeddings import HybridCodeEmbedder, EMBED_CACHE_PATH
 from vector_db import CodeVectorDB
 from pathlib import Path
-from typing import List
+from typing import Iterable, List
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import json
 import sys
 
 
-def index_repositories(repo_paths: List[str], collection_name: str = "elixir_code"):
+def embed_and_upload(
+    chunks: Iterable[Chunk],
+    embedder: HybridCodeEmbedder,
+    db: CodeVectorDB,
+    window: int = 512
+) -> int:
+    """
+    Embed and upload chunks one window at a time
+
+    Each window is uploaded on a background thread while the next one is
+    embedded, so the model and Qdrant's disk writes work at the same
+    time. At most two windows of chunks and vectors are held in memory,
+    so corpora larger than RAM can be indexed.
+
+    Args:
+        chunks: Any iterable of code chunks (lists or generators)
+        embedder: Embedding model
+        db: Target vector database (collection must exist)
+        window: Chunks embedded and uploaded per step
+
+    Returns:
+        Number of chunks indexed
+    """
+    chunks = iter(chunks)
+    total = 0
+    pending = None  # Upload of the previous window
+
+    with ThreadPoolExecutor(max_workers=1) as uploader:
+        while True:
+            batch = list(islice(chunks, window))
+            if not batch:
+                break
+
+            embeddings = embedder.encode_chunks(batch)
+
+            # One upload in flight: wait for it before queueing the next
+            if pending is not None:
+                pending.result()
+                print(f"  ... {total} chunks indexed")
+            pending = uploader.submit(db.index_chunks, batch, embeddings)
+            total += len(batch)
+
+        if pending is not None:
+            pending.result()
+            print(f"  ... {total} chunks indexed")
+
+    return total
+
+
+def index_repositories(repo_paths: List[str], collection_name: str = "elixir_code", quantization: str = "scalar"):
     """
     Index multiple repositories into Qdrant
 
     Args:
         repo_paths: List of paths to repositories
         collection_name: Name for the Qdrant collection
+        quantization: "scalar" (int8), "binary" (1-bit) or None
     """
     print("="*80)
     print("INDEXING HUB88 REPOSITORIES")
@@ -54,51 +107,36 @@ def index_repositories(repo_paths: List[str], collection_name: str = "elixir_cod
     print("INITIALIZING COMPONENTS")
     print("="*80)
 
-    embedder = HybridCodeEmbedder()
+    # Unchanged chunks reuse their vectors from the last run
+    embedder = HybridCodeEmbedder(persist_path=EMBED_CACHE_PATH)
     db = CodeVectorDB(collection_name=collection_name)
 
     # Create collection
-    db.create_collection(embedding_dim=embedder.embedding_dim)
+    db.create_collection(embedding_dim=embedder.embedding_dim, quantization=quantization)
 
-    # Process each repository
+    # Chunk, embed and upload as a stream so vectors never pile up in RAM
     print("\n" + "="*80)
-    print("CHUNKING CODE")
+    print("CHUNKING, EMBEDDING AND UPLOADING")
     print("="*80)
 
-    all_chunks = []
-
-    for repo_path in valid_repos:
-        print(f"\n📁 Processing: {repo_path}")
-        chunks = chunk_repository(repo_path)
-        all_chunks.extend(chunks)
+    # One chunking process pool shared by all repositories
+    total_chunks = embed_and_upload(chunk_repositories(valid_repos), embedder, db)
 
-    print(f"\n✓ Total chunks: {len(all_chunks)}")
+    print(f"\n✓ Total chunks: {total_chunks}")
 
-    if not all_chunks:
+    if not total_chunks:
         print("❌ No Elixir code found in repositories!")
         sys.exit(1)
 
-    # Generate embeddings
-    print("\n" + "="*80)
-    print("GENERATING EMBEDDINGS")
-    print("="*80)
-
-    texts = [chunk['text'] for chunk in all_chunks]
-    embeddings = embedder.encode_batch(texts, batch_size=32)
-
-    # Index into Qdrant
-    print("\n" + "="*80)
-    print("UPLOADING TO QDRANT")
-    print("="*80)
-
-    db.index_chunks(all_chunks, embeddings)
-
     # Save metadata
     metadata = {
         'repos': repo_paths,
-        'total_chunks': len(all_chunks),
+        'total_chunks': total_chunks,
         'embedding_dim': embedder.embedding_dim,
-        'collection_name': collection_name
+        'collection_name': collection_name,
+        'embedding_cache_hit_rate': embedder.cache_stats()['chunk_hit_rate'],
+        # The web UI drops saved answers from before this index
+        'indexed_at': datetime.now().isoformat()
     }
 
     with open('index_metadata.json', 'w') as f:
@@ -107,7 +145,7 @@ def index_repositories(repo_paths: List[str], collection_name: str = "elixir_cod
     print("\n" + "="*80)
     print("✅ INDEXING COMPLETE!")
     print("="*80)
-    print(f"Indexed {len(all_chunks)} chunks from {len(valid_repos)} repositories")
+    print(f"Indexed {total_chunks} chunks from {len(valid_repos)} repositories")
     print(f"Collection: {collection_name}")
     print(f"Metadata saved to: index_metadata.json")
     print("\n💡 You can now query your codebase with: python query_hub88.py")
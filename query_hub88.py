@@ -27,19 +27,37 @@ from embeddings import HybridCodeEmbedder
 from vector_db import CodeVectorDB
 import sys
 import os
+import threading
 
 
 def main():
     """
     Interactive query interface
     """
+    # Load the embedding model in the background while we talk to Qdrant.
+    # A daemon thread, so the early exits below don't wait for the model
+    loaded = {}
+
+    def load_embedder():
+        try:
+            loaded['embedder'] = HybridCodeEmbedder()
+        except Exception as e:
+            loaded['error'] = e
+
+    loader = threading.Thread(target=load_embedder, name="embedder-loader", daemon=True)
+    loader.start()
+
     # Check if index exists
     try:
-        from vector_db import CodeVectorDB
-        db = CodeVectorDB()
-        stats = db.get_stats()
+        db = CodeVectorDB(collection_name="elixir_code")
+
+        # A missing collection and an empty one get the same guidance
+        if db.client.collection_exists(db.collection_name):
+            stats = db.get_stats()
+        else:
+            stats = {'total_points': 0}
 
-        if stats['total_points'] == 0:
+        if not stats['total_points']:
             print("❌ No indexed data found!")
             print("\nPlease run indexing first:")
             print("    python index_hub88.py")
@@ -64,11 +82,12 @@ def main():
 
     # Load indexed database
     print("\nLoading indexed codebase...")
-    embedder = HybridCodeEmbedder()
-    db = CodeVectorDB(collection_name="elixir_code")
+    loader.join()
+    if 'error' in loaded:
+        raise loaded['error']
+    embedder = loaded['embedder']
 
     # Show stats
-    stats = db.get_stats()
     print(f"✓ Loaded collection: {stats['total_points']} code chunks")
 
     # Initialize RAG
@@ -120,13 +139,9 @@ def main():
             if not question:
                 continue
 
-            # Query the system
-            answer = rag.query(question, k=5, verbose=True)
-
-            print("\n" + "="*80)
-            print("📝 Answer:")
+            # Query the system (the answer is printed as it streams in)
+            rag.query(question, k=5, verbose=True, stream=True)
             print("="*80)
-            print(answer)
 
         except KeyboardInterrupt:
             print("\n\n👋 Goodbye!")
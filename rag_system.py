@@ -8,12 +8,24 @@ Features:
 - Re-ranking for better results
 - Support for both Ollama (Codestral) and Claude API
 - Query optimization
+- Exact + semantic answer cache for repeated questions
+- Token streaming for chat UIs (stream_query)
 """
 
-from embeddings import HybridCodeEmbedder
+from embeddings import HybridCodeEmbedder, batch_dot
 from vector_db import CodeVectorDB
-from typing import List, Dict
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
 import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
 
 # Optional: Only imported if needed
 try:
@@ -31,6 +43,252 @@ except ImportError:
     print("⚠ Anthropic not installed. Install with: pip install anthropic")
 
 
+SEP = '=' * 80
+
+# Formatted once per context chunk / once per prompt. The header carries
+# no per-query values (like the similarity score), so a chunk renders to
+# the same bytes whichever question retrieved it
+CONTEXT_HEADER_TEMPLATE = """
+{sep}
+[Context {i}]
+File: {file}
+"""
+
+# Identical on every request and sent first, so the LLM server can reuse
+# its processed prefix instead of re-reading it for each question
+SYSTEM_PROMPT = """You are an expert Elixir developer working on the Hub88 gaming platform.
+
+Instructions:
+- Use the code examples provided with the question as reference
+- Follow the patterns and conventions from the codebase
+- Provide working, production-quality Elixir code
+- Explain your approach briefly"""
+
+PROMPT_TEMPLATE = """Here is relevant code from the codebase:
+{context}
+
+{sep}
+
+Question: {query}
+
+Answer:"""
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of answers, matched exactly or by embedding similarity
+
+    Exact hits are looked up by SHA-256 of the question and need no
+    embedding. Near-duplicates ("how do we handle permissions?" vs
+    "how are permissions handled") match when the dot product of the
+    normalized query vectors is >= threshold. Entries only match within
+    the same scope (k, repo filter), since those change the answer.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 3600, threshold: float = 0.97):
+        """
+        Args:
+            max_size: Max cached answers (oldest evicted first)
+            ttl_seconds: Entry lifetime (None = never expire)
+            threshold: Min similarity for a semantic hit
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        # What the answers were generated against (e.g. the index build);
+        # saved with the file, and load() drops a file with another tag
+        self.tag = None
+
+        # key -> (query_vector, answer, timestamp, scope)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        # Serializes save() so snapshots reach the file in the order taken
+        self._save_lock = threading.Lock()
+        # Stacked vectors for the similarity scan, rebuilt lazily after changes
+        self._keys = []
+        self._matrix = None
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # Entries changed since the last save()/load()
+        self._dirty = False
+
+    @staticmethod
+    def _key(question: str, scope: Tuple) -> bytes:
+        return hashlib.sha256(repr((question, scope)).encode('utf-8')).digest()
+
+    def _expired(self, timestamp: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - timestamp > self.ttl_seconds
+
+    def _drop(self, key: bytes):
+        del self._entries[key]
+        self._matrix = None
+
+    def get(self, question: str, scope: Tuple = ()) -> Optional[str]:
+        """Exact lookup (no embedding needed)"""
+        key = self._key(question, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2]):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_similar(self, query_vector: np.ndarray, scope: Tuple = (), threshold: float = None) -> Optional[str]:
+        """
+        Semantic lookup: best cached answer above the similarity threshold
+
+        threshold overrides self.threshold for this call only, so callers
+        sharing one cache can each use their own.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[key][0] for key in self._keys])
+
+            similarities = batch_dot(self._matrix, query_vector)
+            # Best match first; skip entries from another scope or past their TTL
+            for i in np.argsort(similarities)[::-1]:
+                if similarities[i] < threshold:
+                    break
+                key = self._keys[i]
+                entry = self._entries.get(key)
+                if entry is None or entry[3] != scope:
+                    continue
+                if self._expired(entry[2]):
+                    self._drop(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.semantic_hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, query_vector: np.ndarray, answer: str, scope: Tuple = ()):
+        """Store an answer"""
+        if self.max_size <= 0:
+            return
+        key = self._key(question, scope)
+        with self._lock:
+            self._entries[key] = (np.asarray(query_vector, dtype=np.float32), answer, time.monotonic(), scope)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._dirty = True
+
+    def save(self, path: str) -> bool:
+        """
+        Write the cache to an .npz file (skipped if nothing changed)
+
+        Vectors are stored as float16; entry ages rather than timestamps,
+        since time.monotonic() doesn't carry across processes.
+
+        Returns:
+            True if the file was written
+        """
+        with self._save_lock:
+            return self._save(path)
+
+    def _save(self, path: str) -> bool:
+        with self._lock:
+            if not self._dirty:
+                return False
+            now = time.monotonic()
+            keys = list(self._entries)
+            entries = [self._entries[key] for key in keys]
+            vectors = (np.stack([entry[0] for entry in entries]).astype(np.float16)
+                       if entries else np.empty((0, 0), dtype=np.float16))
+            meta = [
+                [key.hex(), entry[1], now - entry[2], list(entry[3])]
+                for key, entry in zip(keys, entries)
+            ]
+            tag = self.tag
+            self._dirty = False
+
+        # Unique temp file, so a save from another cache (or process) on the
+        # same path can't write into ours
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vectors=vectors, meta=np.array(json.dumps(meta)), tag=np.array(json.dumps(tag)))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            with self._lock:
+                self._dirty = True  # Still unsaved; the next save() retries
+            raise
+        return True
+
+    def load(self, path: str, tag=None) -> int:
+        """
+        Restore entries written by save(), dropping expired ones
+
+        Args:
+            path: File written by save()
+            tag: Becomes self.tag; a file saved under a different tag holds
+                 stale answers and is ignored
+
+        Returns:
+            Number of entries loaded
+        """
+        self.tag = tag
+        if not os.path.exists(path):
+            return 0
+
+        with np.load(path) as data:
+            saved_tag = json.loads(str(data['tag'])) if 'tag' in data.files else None
+            if saved_tag != tag:
+                return 0
+            vectors = data['vectors'].astype(np.float32)
+            meta = json.loads(str(data['meta']))
+
+        now = time.monotonic()
+        with self._lock:
+            for vector, (key, answer, age, scope) in zip(vectors, meta):
+                if self.ttl_seconds is not None and age > self.ttl_seconds:
+                    continue
+                self._entries[bytes.fromhex(key)] = (vector, answer, now - age, tuple(scope))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self._dirty = False
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters"""
+        with self._lock:
+            hits = self.hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0
+            }
+
+
 class ElixirRAG:
     """
     RAG system for Elixir code assistance
@@ -39,13 +297,26 @@ class ElixirRAG:
     to generate informed responses.
     """
 
+    # Below this many points a brute-force scan beats walking the HNSW graph
+    EXACT_SEARCH_MAX_POINTS = 5000
+
+    # Payload fields the heuristic reranker reads; oversampled candidates
+    # are fetched without their code text, which is hydrated for the top k
+    RERANK_FIELDS = ['file', 'type', 'metadata']
+
     def __init__(
         self,
         vector_db: CodeVectorDB,
         embedder: HybridCodeEmbedder,
         model: str = "codestral",
         use_claude: bool = False,
-        claude_api_key: str = None
+        claude_api_key: str = None,
+        cache_size: int = 1000,
+        cache_ttl: float = 3600,
+        keep_alive: str = "30m",
+        use_cross_encoder: bool = False,
+        cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        canonical_context_order: bool = False
     ):
         """
         Initialize RAG system
@@ -56,11 +327,50 @@ class ElixirRAG:
             model: Model name for Ollama (if not using Claude)
             use_claude: Whether to use Claude API instead of Ollama
             claude_api_key: Anthropic API key (or set ANTHROPIC_API_KEY env var)
+            cache_size: Max cached answers (0 disables the answer cache)
+            cache_ttl: Seconds a cached answer stays valid
+            keep_alive: How long Ollama keeps the model loaded between questions
+            use_cross_encoder: Re-rank candidates with a cross-encoder that
+                              reads query and code together (~ms per candidate)
+            cross_encoder_model: Cross-encoder to load when enabled
+            canonical_context_order: Put retrieved chunks in the prompt in
+                              a fixed order (by file and point ID) instead
+                              of by relevance, so the same chunks always give
+                              the same prompt prefix and the LLM server's
+                              prompt cache can reuse it. Off by default: the
+                              best match no longer comes first
         """
         self.db = vector_db
         self.embedder = embedder
         self.model = model
         self.use_claude = use_claude
+        self.keep_alive = keep_alive
+        self.canonical_context_order = canonical_context_order
+        self.cache = QueryCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        # question key -> (lock, waiters) for answers being generated
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        # Collection size is read once; it only changes on re-indexing
+        try:
+            self._db_size = self.db.get_stats()['total_points'] or 0
+        except Exception:
+            self._db_size = None
+        self._exact_search = self._db_size is not None and self._db_size < self.EXACT_SEARCH_MAX_POINTS
+
+        self.cross_encoder = None
+        if use_cross_encoder:
+            from sentence_transformers import CrossEncoder
+            # Same CPU backend as the embedder (onnx/openvino), torch otherwise
+            backend = getattr(self.embedder, 'backend', 'torch')
+            try:
+                self.cross_encoder = CrossEncoder(cross_encoder_model, backend=backend)
+            except Exception as e:
+                if backend == 'torch':
+                    raise
+                print(f"⚠ {backend} cross-encoder not available ({e}), using torch")
+                self.cross_encoder = CrossEncoder(cross_encoder_model)
+            print(f"✓ Cross-encoder re-ranking ({cross_encoder_model})")
 
         if use_claude:
             if not ANTHROPIC_AVAILABLE:
@@ -77,12 +387,18 @@ class ElixirRAG:
                 raise ImportError("Ollama not installed. Run: pip install ollama")
             print(f"✓ RAG System initialized (model={model})")
 
+        # Decide the backend once instead of on every query
+        self._invoke = self._invoke_claude if use_claude else self._invoke_ollama
+        self._stream = self._stream_claude if use_claude else self._stream_ollama
+        self._model_display = "Claude" if use_claude else model
+
     def retrieve_context(
         self,
         query: str,
         k: int = 5,
         repo_filter: str = None,
-        rerank: bool = True
+        rerank: bool = True,
+        query_vector: np.ndarray = None
     ) -> List:
         """
         Retrieve relevant code chunks
@@ -98,32 +414,110 @@ class ElixirRAG:
             k: Number of results to return
             repo_filter: Filter by repository name
             rerank: Whether to re-rank results
+            query_vector: Already-computed query embedding (optional)
 
         Returns:
             List of search results
         """
-        # Encode query
-        query_vector = self.embedder.encode(query)
+        # Encode query (repeats are served by the embedder's LRU cache)
+        if query_vector is None:
+            query_vector = self.embedder.encode(query)
 
-        # Search (retrieve more than k for re-ranking)
-        initial_k = k * 3 if rerank else k
+        # Search (retrieve more than k for re-ranking, at most 20 extra)
+        initial_k = min(k + 20, 3 * k) if rerank else k
+        payload = self._candidate_payload(rerank)
         results = self.db.search(
             query_vector=query_vector,
             limit=initial_k,
             repo_filter=repo_filter,
-            score_threshold=0.3  # Filter low-quality matches
+            score_threshold=0.3,  # Filter low-quality matches
+            exact=self._exact_search,
+            payload=payload
+        )
+
+        selected = self._select(query, results.points, k, rerank)
+        return selected if payload is True else self._hydrate(selected)
+
+    def retrieve_context_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        repo_filter: str = None,
+        rerank: bool = True,
+        query_vectors: np.ndarray = None,
+        repo_filters: List[str] = None
+    ) -> List[List]:
+        """
+        Retrieve context for several queries at once
+
+        All queries are encoded in one batch and searched in a single
+        Qdrant request instead of one round-trip each.
+
+        Args:
+            queries: User queries
+            k: Number of results per query
+            repo_filter: Filter by repository name (applies to all)
+            rerank: Whether to re-rank results
+            query_vectors: Already-computed query embeddings (optional)
+            repo_filters: Per-query repository filters (overrides repo_filter)
+
+        Returns:
+            One list of search results per query, in order
+        """
+        if not queries:
+            return []
+
+        if query_vectors is None:
+            query_vectors = self.embedder.encode_batch(queries)
+
+        initial_k = min(k + 20, 3 * k) if rerank else k
+        payload = self._candidate_payload(rerank)
+        responses = self.db.search_batch(
+            query_vectors=query_vectors,
+            limit=initial_k,
+            repo_filter=repo_filter,
+            score_threshold=0.3,
+            exact=self._exact_search,
+            filters=None if repo_filters is None else [{'repo': repo} for repo in repo_filters],
+            payload=payload
         )
 
-        if not results.points:
+        selected = [
+            self._select(query, response.points, k, rerank)
+            for query, response in zip(queries, responses)
+        ]
+        if payload is not True:
+            # One retrieve call for every query's final top-k
+            self._hydrate([point for points in selected for point in points])
+        return selected
+
+    def _candidate_payload(self, rerank: bool):
+        """Payload to fetch with the search hits (see RERANK_FIELDS)"""
+        # The cross-encoder reads every candidate's text; without reranking
+        # all hits are kept anyway
+        if not rerank or self.cross_encoder is not None:
+            return True
+        return self.RERANK_FIELDS
+
+    def _hydrate(self, points: List) -> List:
+        """Replace the partial payloads of the kept points with full ones"""
+        payloads = self.db.hydrate([point.id for point in points])
+        for point in points:
+            point.payload = payloads.get(point.id, point.payload)
+        return points
+
+    def _select(self, query: str, points: List, k: int, rerank: bool) -> List:
+        """Top-k of the raw search hits, re-ranked if enabled"""
+        if not points:
             print("⚠ No results found")
             return []
 
         # Re-rank if enabled
-        if rerank and len(results.points) > k:
-            reranked_points = self._rerank(query, results.points, k)
+        if rerank and len(points) > k:
+            reranked_points = self._rerank(query, points, k)
             return reranked_points[:k]
 
-        return results.points[:k]
+        return points[:k]
 
     def _rerank(self, query: str, results: List, k: int) -> List:
         """
@@ -134,6 +528,9 @@ class ElixirRAG:
         - Documented code
         - Multi-function chunks
 
+        With a cross-encoder, the base score blends its relevance (70%)
+        with the vector similarity (30%) before the bonuses are added.
+
         Args:
             query: Original query
             results: Search results
@@ -142,73 +539,73 @@ class ElixirRAG:
         Returns:
             Re-ranked results
         """
-        def score(result):
+        n = len(results)
+        # Already exact: Qdrant rescores the quantized candidates against the
+        # stored originals (rescore=True), so there is nothing to recompute here
+        scores = np.fromiter((r.score for r in results), dtype=np.float32, count=n)
+
+        if self.cross_encoder is not None:
+            # One batched forward pass; logits -> 0..1 to match the vector scores
+            pairs = [(query, r.payload['text'][:512]) for r in results]
+            logits = np.asarray(self.cross_encoder.predict(pairs, batch_size=16), dtype=np.float32)
+            scores = 0.7 / (1.0 + np.exp(-logits)) + 0.3 * scores
+        is_module = np.empty(n, dtype=np.float32)
+        has_docs = np.empty(n, dtype=np.float32)
+        func_count = np.empty(n, dtype=np.float32)
+        for i, result in enumerate(results):
             payload = result.payload
-            score = result.score
-
-            # Boost complete modules
-            if payload.get('type') == 'module':
-                score += 0.1
-
-            # Boost documented code
-            if payload.get('metadata', {}).get('has_docs'):
-                score += 0.05
-
-            # Boost multi-function chunks
-            func_count = payload.get('metadata', {}).get('function_count', 0)
-            score += min(func_count * 0.01, 0.05)
-
-            return score
-
-        # Re-sort by new score
-        results = sorted(results, key=score, reverse=True)
-        return results[:k]
+            metadata = payload.get('metadata') or {}
+            is_module[i] = payload.get('type') == 'module'
+            has_docs[i] = bool(metadata.get('has_docs'))
+            func_count[i] = metadata.get('function_count', 0)
+
+        scores += 0.1 * is_module                       # Boost complete modules
+        scores += 0.05 * has_docs                       # Boost documented code
+        scores += np.minimum(func_count * 0.01, 0.05)   # Boost multi-function chunks
+
+        # Partition out the top k, then sort only those
+        if k < n:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [results[i] for i in top]
 
     def build_prompt(self, query: str, context: List) -> str:
         """
-        Build prompt with retrieved context
+        Build the user prompt with retrieved context
+
+        The fixed instructions live in SYSTEM_PROMPT and are sent as a
+        separate system message. Chunks keep their relevance order unless
+        canonical_context_order is set, which sorts them by (file, point ID)
+        so any question retrieving the same set gives the same context block.
 
         Args:
             query: User question
             context: Retrieved code chunks
 
         Returns:
-            Complete prompt for LLM
+            User prompt for the LLM
         """
-        context_str = ""
+        if self.canonical_context_order:
+            context = sorted(context, key=lambda result: (result.payload['file'], str(result.id)))
+
+        parts = []
 
         for i, result in enumerate(context, 1):
             payload = result.payload
-            score = result.score
 
-            context_str += f"\n{'='*80}\n"
-            context_str += f"[Context {i}] (similarity: {score:.2f})\n"
-            context_str += f"File: {payload['file']}\n"
+            parts.append(CONTEXT_HEADER_TEMPLATE.format(sep=SEP, i=i, file=payload['file']))
 
             if payload.get('module'):
-                context_str += f"Module: {payload['module']}\n"
+                parts.append(f"Module: {payload['module']}\n")
 
             if payload.get('functions'):
-                context_str += f"Functions: {', '.join(payload['functions'])}\n"
-
-            context_str += f"\n{payload['text']}\n"
-
-        prompt = f"""You are an expert Elixir developer working on the Hub88 gaming platform.
-
-Here is relevant code from the codebase:
-{context_str}
+                parts.append(f"Functions: {', '.join(payload['functions'])}\n")
 
-{'='*80}
-
-Question: {query}
-
-Instructions:
-- Use the code examples above as reference
-- Follow the patterns and conventions from the codebase
-- Provide working, production-quality Elixir code
-- Explain your approach briefly
+            parts.append(f"\n{payload['text']}\n")
 
-Answer:"""
+        prompt = PROMPT_TEMPLATE.format_map({'context': "".join(parts), 'sep': SEP, 'query': query})
 
         return prompt
 
@@ -217,7 +614,9 @@ Answer:"""
         question: str,
         k: int = 5,
         repo_filter: str = None,
-        verbose: bool = True
+        verbose: bool = True,
+        stream: bool = False,
+        similarity: float = None
     ) -> str:
         """
         Main query interface - ask questions about your codebase
@@ -227,52 +626,332 @@ Answer:"""
             k: Number of context chunks to retrieve
             repo_filter: Filter to specific repository
             verbose: Whether to print debug info
+            stream: Print the answer to stdout as it is generated
+                    (the full answer is still returned)
+            similarity: Min similarity for reusing a cached answer to a
+                        near-duplicate question (default: the cache's threshold)
 
         Returns:
             Answer from LLM
         """
+        # Identical questions in flight wait here and then hit the cache
+        with self._single_flight(question, (k, repo_filter)):
+            answer, prompt, query_vector = self._prepare(question, k, repo_filter, verbose, similarity)
+            if answer is not None:
+                if stream:
+                    print(answer)
+                return answer
+
+            # Query model
+            if verbose:
+                print(f"\n🤖 Querying {self._model_display}...")
+            if stream:
+                print()
+
+            answer = self._invoke(prompt, stream=stream)
+
+            if self.cache.max_size > 0:
+                self.cache.put(question, query_vector, answer, (k, repo_filter))
+
+            return answer
+
+    def stream_query(
+        self,
+        question: str,
+        k: int = 5,
+        repo_filter: str = None,
+        stop_event: threading.Event = None,
+        similarity: float = None
+    ) -> Iterator[str]:
+        """
+        Like query(), but yields the answer piece by piece as the LLM writes it
+
+        For UIs that render tokens as they arrive (e.g. st.write_stream).
+        Cached and "no context" answers arrive as a single piece. Setting
+        stop_event ends generation after the current piece; stopped
+        answers are not cached.
+
+        Args:
+            question: Question to ask
+            k: Number of context chunks to retrieve
+            repo_filter: Filter to specific repository
+            stop_event: Set from another thread to abort generation
+            similarity: Min similarity for reusing a cached answer to a
+                        near-duplicate question (default: the cache's threshold)
+
+        Yields:
+            Answer text fragments
+        """
+        with self._single_flight(question, (k, repo_filter)):
+            answer, prompt, query_vector = self._prepare(question, k, repo_filter, False, similarity)
+            if answer is not None:
+                yield answer
+                return
+
+            parts = []
+            tokens = self._stream(prompt)
+            try:
+                for text in tokens:
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    parts.append(text)
+                    yield text
+            finally:
+                tokens.close()  # Ends the HTTP stream if we stopped early
+
+            if self.cache.max_size > 0:
+                self.cache.put(question, query_vector, "".join(parts), (k, repo_filter))
+
+    @contextmanager
+    def _single_flight(self, question: str, scope: Tuple):
+        """
+        Serialize answering the same question (within the same scope)
+
+        The web UI shares one ElixirRAG between all sessions. When several
+        ask the same thing at once (e.g. the example buttons), the first
+        runs retrieval and the LLM; the rest wait, then get its answer from
+        the cache instead of each generating it again.
+        """
+        if self.cache.max_size <= 0:
+            # Nowhere to share the answer through
+            yield
+            return
+
+        key = QueryCache._key(question, scope)
+        with self._inflight_lock:
+            lock, waiters = self._inflight.get(key) or (threading.Lock(), 0)
+            self._inflight[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._inflight_lock:
+                waiters = self._inflight[key][1] - 1
+                if waiters:
+                    self._inflight[key] = (lock, waiters)
+                else:
+                    del self._inflight[key]
+
+    def _prepare(self, question: str, k: int, repo_filter: str, verbose: bool, similarity: float = None) -> Tuple:
+        """
+        Shared front half of query() and stream_query()
+
+        Returns:
+            (answer, None, None) for a cached or "no context" answer,
+            otherwise (None, prompt, query_vector) ready for the LLM
+        """
         if verbose:
             print(f"\n🔍 Query: {question}")
             print("="*80)
 
+        # Answer cache: exact question first, then near-duplicates
+        scope = (k, repo_filter)
+        query_vector = None
+        if self.cache.max_size > 0:
+            cached = self.cache.get(question, scope)
+            if cached is None:
+                query_vector = self.embedder.encode(question)
+                cached = self.cache.get_similar(query_vector, scope, similarity)
+            if cached is not None:
+                if verbose:
+                    print("\n⚡ Answered from cache")
+                return cached, None, None
+
         # Retrieve context
         context = self.retrieve_context(
             query=question,
             k=k,
-            repo_filter=repo_filter
+            repo_filter=repo_filter,
+            query_vector=query_vector
         )
 
         if not context:
-            return "No relevant code found in the codebase."
+            return "No relevant code found in the codebase.", None, None
 
         if verbose:
             print(f"\n✓ Retrieved {len(context)} relevant chunks")
             for i, res in enumerate(context, 1):
                 print(f"  {i}. {res.payload['file']} (score: {res.score:.2f})")
 
-        # Build prompt
-        prompt = self.build_prompt(question, context)
+        return None, self.build_prompt(question, context), query_vector
 
-        # Query model
-        if verbose:
-            print(f"\n🤖 Querying {self.model if not self.use_claude else 'Claude'}...")
-
-        if self.use_claude:
-            response = self.claude_client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            answer = response.content[0].text
-        else:
-            # Use Ollama
-            response = ollama.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            answer = response['message']['content']
-
-        return answer
+    def query_many(
+        self,
+        questions: List[str],
+        k: int = 5,
+        repo_filter: str = None
+    ) -> List[str]:
+        """
+        Answer several questions, sharing one batched retrieval
+
+        Cached answers are returned directly; the remaining questions are
+        encoded and searched together, then sent to the LLM one by one.
+
+        Args:
+            questions: Questions to ask
+            k: Number of context chunks per question
+            repo_filter: Filter to specific repository
+
+        Returns:
+            Answers, in the same order as questions
+        """
+        scope = (k, repo_filter)
+        use_cache = self.cache.max_size > 0
+        answers = [None] * len(questions)
+
+        pending = []
+        for i, question in enumerate(questions):
+            if use_cache:
+                answers[i] = self.cache.get(question, scope)
+            if answers[i] is None:
+                pending.append(i)
+
+        if not pending:
+            return answers
+
+        # One batched encode serves both the semantic cache and the search
+        vectors = self.embedder.encode_batch([questions[i] for i in pending])
+        still_pending = []
+        for i, vector in zip(pending, vectors):
+            if use_cache:
+                answers[i] = self.cache.get_similar(vector, scope)
+            if answers[i] is None:
+                still_pending.append((i, vector))
+
+        if not still_pending:
+            return answers
+
+        contexts = self.retrieve_context_batch(
+            [questions[i] for i, _ in still_pending],
+            k=k,
+            repo_filter=repo_filter,
+            query_vectors=np.stack([vector for _, vector in still_pending])
+        )
+
+        for (i, vector), context in zip(still_pending, contexts):
+            if not context:
+                answers[i] = "No relevant code found in the codebase."
+                continue
+            answers[i] = self._invoke(self.build_prompt(questions[i], context))
+            if use_cache:
+                self.cache.put(questions[i], vector, answers[i], scope)
+
+        return answers
+
+    async def aquery(
+        self,
+        question: str,
+        k: int = 5,
+        repo_filter: str = None
+    ) -> str:
+        """
+        Async query: runs query() on a worker thread
+
+        Encoding, Qdrant and the LLM call all block, so each question gets
+        its own thread; awaiting several lets one question's LLM call
+        overlap the next one's encode and search.
+
+        Args:
+            question: Question to ask
+            k: Number of context chunks to retrieve
+            repo_filter: Filter to specific repository
+
+        Returns:
+            Answer from LLM
+        """
+        # Exact cache hits don't need a thread
+        if self.cache.max_size > 0:
+            cached = self.cache.get(question, (k, repo_filter))
+            if cached is not None:
+                return cached
+
+        return await asyncio.to_thread(self.query, question, k, repo_filter, False)
+
+    async def aquery_many(
+        self,
+        questions: List[str],
+        k: int = 5,
+        repo_filter: str = None,
+        concurrency: int = 4
+    ) -> List[str]:
+        """
+        Answer several questions concurrently
+
+        Args:
+            questions: Questions to ask
+            k: Number of context chunks per question
+            repo_filter: Filter to specific repository
+            concurrency: Questions in flight at once (Qdrant and a local
+                        LLM both saturate at a handful of parallel requests)
+
+        Returns:
+            Answers, in the same order as questions
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(question):
+            async with semaphore:
+                return await self.aquery(question, k=k, repo_filter=repo_filter)
+
+        return await asyncio.gather(*(bounded(q) for q in questions))
+
+    # LLM backends - one pair is bound to self._invoke / self._stream at
+    # construction. Both take the user prompt (SYSTEM_PROMPT is sent
+    # separately as a cacheable prefix). _invoke_* return the full answer,
+    # with stream=True also printing tokens to stdout as they arrive;
+    # _stream_* yield the tokens.
+
+    # Claude caches the system block across requests (prompt caching)
+    _CLAUDE_SYSTEM = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+
+    @staticmethod
+    def _print_stream(tokens: Iterator[str]) -> str:
+        """Echo a token stream to stdout and return the joined text"""
+        parts = []
+        for text in tokens:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            parts.append(text)
+        sys.stdout.write("\n")
+        return "".join(parts)
+
+    def _invoke_claude(self, prompt: str, stream: bool = False) -> str:
+        if stream:
+            return self._print_stream(self._stream_claude(prompt))
+
+        response = self.claude_client.messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=4096,
+            system=self._CLAUDE_SYSTEM,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.content[0].text
+
+    def _stream_claude(self, prompt: str) -> Iterator[str]:
+        with self.claude_client.messages.stream(
+            model="claude-sonnet-4-20250514",
+            max_tokens=4096,
+            system=self._CLAUDE_SYSTEM,
+            messages=[{"role": "user", "content": prompt}]
+        ) as response:
+            yield from response.text_stream
+
+    def _ollama_messages(self, prompt: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _invoke_ollama(self, prompt: str, stream: bool = False) -> str:
+        if stream:
+            return self._print_stream(self._stream_ollama(prompt))
+
+        response = ollama.chat(model=self.model, messages=self._ollama_messages(prompt), keep_alive=self.keep_alive)
+        return response['message']['content']
+
+    def _stream_ollama(self, prompt: str) -> Iterator[str]:
+        for chunk in ollama.chat(model=self.model, messages=self._ollama_messages(prompt), stream=True, keep_alive=self.keep_alive):
+            yield chunk['message']['content']
 
 
 # Example usage
@@ -5,18 +5,71 @@ Start Qdrant server with web UI
 
 import subprocess
 import time
+import urllib.request
 import webbrowser
 import os
 
+# Optional: targeted process lookup (falls back to pkill)
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+def stop_qdrant_processes(timeout: float = 3.0):
+    """
+    Stop running Qdrant server binaries
+
+    Matches the process name exactly, so Python processes that merely use
+    qdrant-client are left alone, and returns as soon as they have exited.
+    """
+    if PSUTIL_AVAILABLE:
+        procs = [p for p in psutil.process_iter(['name']) if p.info['name'] == 'qdrant']
+        for p in procs:
+            try:
+                p.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        _, alive = psutil.wait_procs(procs, timeout=timeout)
+        for p in alive:
+            p.kill()
+        return
+
+    # pkill doesn't wait for exit, so give the old server a moment
+    if subprocess.run(["pkill", "-x", "qdrant"], check=False).returncode == 0:
+        time.sleep(2)
+
+
+def wait_until_ready(url: str = "http://localhost:6333/readyz", timeout: float = 30.0) -> bool:
+    """
+    Poll Qdrant's readiness endpoint until it answers 200
+
+    Returns as soon as the server is up (instead of a fixed sleep), or
+    False after timeout seconds - the first docker run may pull the image.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    return False
+
+
 def start_qdrant_server():
     """Start Qdrant server and open web UI"""
     print("🚀 Starting Qdrant server...")
 
     # Stop any existing Qdrant processes
     try:
-        subprocess.run(["pkill", "-f", "qdrant"], check=False)
-        time.sleep(2)
-    except:
+        stop_qdrant_processes()
+    except Exception:
         pass
 
     # Try Docker first (most reliable)
@@ -27,26 +80,28 @@ def start_qdrant_server():
         if result.returncode == 0:
             print("✅ Docker found, starting Qdrant container...")
 
-            # Stop existing container
-            subprocess.run(["docker", "stop", "qdrant-server"], check=False)
-            subprocess.run(["docker", "rm", "qdrant-server"], check=False)
+            # Stop and remove existing container in one call
+            subprocess.run(["docker", "rm", "-f", "qdrant-server"], check=False, capture_output=True)
 
             # Start new container
             process = subprocess.Popen([
-                "docker", "run", "-p", "6333:6333", "--name", "qdrant-server",
+                "docker", "run", "-p", "6333:6333", "-p", "6334:6334",
+                "-e", "QDRANT__SERVICE__GRPC_PORT=6334",
+                "--name", "qdrant-server",
                 "qdrant/qdrant:latest"
             ])
 
             print("✅ Qdrant server starting...")
             print("🌐 Web UI: http://localhost:6333/dashboard")
             print("📊 API: http://localhost:6333")
+            print("⚡ gRPC: localhost:6334 (export QDRANT_PREFER_GRPC=true)")
 
             # Wait for server to start
             print("⏳ Waiting for server to start...")
-            time.sleep(5)
-
-            # Open browser
-            webbrowser.open("http://localhost:6333/dashboard")
+            if wait_until_ready():
+                webbrowser.open("http://localhost:6333/dashboard")
+            else:
+                print("⚠ Qdrant didn't report ready yet - check the container output above")
 
             print("🔧 Press Ctrl+C to stop the server")
 
@@ -63,14 +118,17 @@ def start_qdrant_server():
     print("🔧 Trying Qdrant binary...")
     try:
         # Try to find and run qdrant binary
+        # The binary listens for gRPC on 6334 by default
         process = subprocess.Popen(["qdrant", "--host", "0.0.0.0", "--port", "6333"])
 
         print("✅ Qdrant binary starting...")
         print("🌐 Web UI: http://localhost:6333/dashboard")
         print("📊 API: http://localhost:6333")
 
-        time.sleep(3)
-        webbrowser.open("http://localhost:6333/dashboard")
+        if wait_until_ready():
+            webbrowser.open("http://localhost:6333/dashboard")
+        else:
+            print("⚠ Qdrant didn't report ready yet - check the output above")
 
         print("🔧 Press Ctrl+C to stop the server")
         process.wait()
@@ -83,7 +141,7 @@ def start_qdrant_server():
     # If all else fails, show instructions
     print("\n🎯 Manual Setup Options:")
     print("\n1️⃣ Install Docker and run:")
-    print("   docker run -p 6333:6333 qdrant/qdrant:latest")
+    print("   docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant:latest")
     print("\n2️⃣ Install Qdrant binary:")
     print("   curl -L https://github.com/qdrant/qdrant/releases/latest/download/qdrant-macos-aarch64.tar.gz | tar xz")
     print("   ./qdrant --host 0.0.0.0 --port 6333")
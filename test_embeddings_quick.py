@@ -93,8 +93,8 @@ end
 
     print(f"   ✓ Created {len(chunks)} chunks")
     for i, chunk in enumerate(chunks, 1):
-        module = chunk.get('module', 'N/A')
-        chunk_type = chunk['type']
+        module = chunk.module or 'N/A'
+        chunk_type = chunk.type
         print(f"   ✓ Chunk {i}: {chunk_type:20s} module={module}")
 
 except Exception as e:
@@ -106,8 +106,8 @@ except Exception as e:
 # Test 5: Test batch embeddings
 print("\n5️⃣ Testing batch embeddings...")
 try:
-    texts = [chunk['text'] for chunk in chunks]
-    embeddings = embedder.encode_batch(texts, batch_size=4)
+    texts = [chunk.text for chunk in chunks]
+    embeddings = embedder.encode_batch(texts, batch_size=64)
     print(f"   ✓ Generated {len(embeddings)} embeddings")
     print(f"   ✓ Embeddings shape: {embeddings.shape}")
 except Exception as e:
@@ -127,22 +127,25 @@ if len(sys.argv) > 1:
     if elixir_files:
         print(f"   ✓ Found {len(elixir_files)} .ex files (showing first 5)")
 
+        # Same parallel path as indexing (stays serial for a handful of files)
+        from code_chunker import chunk_files
+
         all_chunks = []
-        for ex_file in elixir_files:
-            try:
-                chunks = chunker.chunk_file(str(ex_file), repo_name="test")
-                all_chunks.extend(chunks)
-                print(f"   ✓ {ex_file.name}: {len(chunks)} chunks")
-            except Exception as e:
-                print(f"   ⚠️  {ex_file.name}: {e}")
+        for ex_file, chunks, error in chunk_files(elixir_files, repo_name="test", chunker=chunker):
+            name = Path(ex_file).name
+            if error:
+                print(f"   ⚠️  {name}: {error}")
+                continue
+            all_chunks.extend(chunks)
+            print(f"   ✓ {name}: {len(chunks)} chunks")
 
         print(f"\n   ✓ Total chunks from real code: {len(all_chunks)}")
 
         # Generate embeddings for real code
         if all_chunks:
             print(f"   🔄 Generating embeddings for {len(all_chunks)} chunks...")
-            real_texts = [c['text'] for c in all_chunks]
-            real_embeddings = embedder.encode_batch(real_texts, batch_size=8)
+            real_texts = [c.text for c in all_chunks]
+            real_embeddings = embedder.encode_batch(real_texts, batch_size=64)
             print(f"   ✓ Generated {len(real_embeddings)} real embeddings!")
     else:
         print(f"   ⚠️  No .ex files found in {repo_path}")
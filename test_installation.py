@@ -6,10 +6,23 @@ Quick test to verify your installation is working correctly.
 Run this after setup to check everything is installed properly.
 """
 
+import importlib.util
 import sys
 
+# Loaded at most once per run, however many tests need it
+_embedder_singleton = None
+
+
+def get_embedder():
+    """Shared HybridCodeEmbedder (model weights are loaded on first call)"""
+    global _embedder_singleton
+    if _embedder_singleton is None:
+        from embeddings import HybridCodeEmbedder
+        _embedder_singleton = HybridCodeEmbedder()
+    return _embedder_singleton
+
 def test_imports():
-    """Test that all required packages are installed"""
+    """Test that all required packages are installed (without importing them)"""
     print("Testing imports...")
     
     required_packages = {
@@ -27,22 +40,22 @@ def test_imports():
     success = True
     
     # Test required packages
+    # find_spec only locates the package; importing torch & co. here
+    # would cost seconds before the real checks even start
     print("\nRequired packages:")
     for package, name in required_packages.items():
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"  ✓ {name}")
-        except ImportError:
+        else:
             print(f"  ✗ {name} - NOT FOUND")
             success = False
     
     # Test optional packages
     print("\nOptional packages:")
     for package, name in optional_packages.items():
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"  ✓ {name}")
-        except ImportError:
+        else:
             print(f"  ⚠ {name} - not installed (okay if not using)")
     
     return success
@@ -78,10 +91,8 @@ def test_embeddings():
     print("Testing embedding generation...")
     
     try:
-        from embeddings import HybridCodeEmbedder
-        
         print("  Loading model (this may take a moment)...")
-        embedder = HybridCodeEmbedder()
+        embedder = get_embedder()
         
         print("  Testing single encoding...")
         test_text = "def hello, do: :world"
@@ -2,13 +2,14 @@
 """
 Test Ollama model directly without embeddings
 """
-import requests
+import httpx
 import json
 
 def test_model_direct():
     """Test llama3.2:3b model directly"""
 
-    url = "http://localhost:11434/api/generate"
+    # One client for every prompt: the TCP connection is kept alive
+    client = httpx.Client(base_url="http://localhost:11434", timeout=30)
 
     # Test prompts
     prompts = [
@@ -32,7 +33,7 @@ def test_model_direct():
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=30)
+            response = client.post("/api/generate", json=payload)
             if response.status_code == 200:
                 result = response.json()
                 print(f"Response: {result.get('response', 'No response')}")
@@ -43,6 +44,7 @@ def test_model_direct():
 
         print()
 
+    client.close()
     print("✅ Direct model testing complete!")
 
 if __name__ == "__main__":
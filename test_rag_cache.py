@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+test_rag_cache.py
+
+Checks that answers warmed ahead of time are reused by the chat.
+
+Run with: pytest test_rag_cache.py
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+rag_system = pytest.importorskip("rag_system")
+np = pytest.importorskip("numpy")
+
+
+class FakeEmbedder:
+    """Same unit vector for every text (no model needed)"""
+
+    def encode(self, text):
+        return np.ones(4, dtype=np.float32) / 2
+
+
+def make_rag():
+    """ElixirRAG with a real QueryCache and a counting fake LLM"""
+    rag = rag_system.ElixirRAG.__new__(rag_system.ElixirRAG)
+    rag.cache = rag_system.QueryCache()
+    rag._inflight = {}
+    rag._inflight_lock = threading.Lock()
+    rag.embedder = FakeEmbedder()
+    rag.canonical_context_order = False
+    rag.calls = 0
+
+    def retrieve_context(query, k, repo_filter, query_vector=None):
+        return [SimpleNamespace(id=1, score=0.9, payload={"file": "lib/a.ex", "text": "code"})]
+
+    def invoke(prompt, stream=False):
+        rag.calls += 1
+        return "warmed answer"
+
+    def stream(prompt):
+        rag.calls += 1
+        yield "fresh answer"
+
+    rag.retrieve_context = retrieve_context
+    rag._invoke = invoke
+    rag._stream = stream
+    return rag
+
+
+def test_warmed_example_is_served_from_cache():
+    rag = make_rag()
+    question = "How do we handle permissions in our codebase?"
+
+    # web_ui's ExampleWarmer
+    rag.query(question, k=5, repo_filter=None, verbose=False)
+
+    # web_ui's chat_fragment with the default settings (empty filter box -> None)
+    answer = "".join(rag.stream_query(
+        question,
+        k=5,
+        repo_filter=None,
+        stop_event=threading.Event(),
+        similarity=0.97
+    ))
+
+    assert answer == "warmed answer"
+    assert rag.calls == 1
+
+
+def test_saved_answers_are_dropped_for_another_index(tmp_path):
+    path = str(tmp_path / "sem_cache.npz")
+    cache = rag_system.QueryCache()
+    cache.load(path, tag="2026-01-01T00:00:00")
+    cache.put("question", FakeEmbedder().encode("question"), "old answer", (5, None))
+    assert cache.save(path)
+
+    same_index = rag_system.QueryCache()
+    assert same_index.load(path, tag="2026-01-01T00:00:00") == 1
+
+    reindexed = rag_system.QueryCache()
+    assert reindexed.load(path, tag="2026-02-01T00:00:00") == 0
+    assert reindexed.get("question", (5, None)) is None
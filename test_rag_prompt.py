@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+test_rag_prompt.py
+
+Checks the order ElixirRAG.build_prompt puts retrieved chunks in.
+
+Run with: pytest test_rag_prompt.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+rag_system = pytest.importorskip("rag_system")
+
+
+def make_rag(**options):
+    """ElixirRAG with only the prompt settings (no model or database)"""
+    rag = rag_system.ElixirRAG.__new__(rag_system.ElixirRAG)
+    rag.canonical_context_order = options.get("canonical_context_order", False)
+    return rag
+
+
+def make_results():
+    """Search results, best match first, with files out of path order"""
+    return [
+        SimpleNamespace(id=3, payload={"file": "lib/z_best.ex", "text": "BEST"}),
+        SimpleNamespace(id=1, payload={"file": "lib/a_second.ex", "text": "SECOND"}),
+        SimpleNamespace(id=2, payload={"file": "lib/m_third.ex", "text": "THIRD"}),
+    ]
+
+
+def positions(prompt):
+    return [prompt.index(marker) for marker in ("BEST", "SECOND", "THIRD")]
+
+
+def test_default_keeps_relevance_order():
+    prompt = make_rag().build_prompt("question", make_results())
+    assert positions(prompt) == sorted(positions(prompt))
+    assert prompt.index("[Context 1]") < prompt.index("lib/z_best.ex")
+
+
+def test_canonical_order_sorts_by_file():
+    prompt = make_rag(canonical_context_order=True).build_prompt("question", make_results())
+    assert prompt.index("SECOND") < prompt.index("THIRD") < prompt.index("BEST")
+
+
+def test_constructor_default_is_relevance_order():
+    import inspect
+    default = inspect.signature(rag_system.ElixirRAG.__init__).parameters["canonical_context_order"].default
+    assert default is False
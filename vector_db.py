@@ -4,7 +4,8 @@ vector_db.py
 Qdrant vector database setup with optimizations for code search.
 
 Features:
-- Cosine distance for semantic similarity
+- Dot-product distance on normalized embeddings (same ranking as cosine)
+- int8 scalar quantization with full-precision rescoring
 - Payload indexing for fast filtering
 - Batch upload support
 - Hybrid search capabilities
@@ -12,15 +13,40 @@ Features:
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
-    Distance, VectorParams, PointStruct,
+    Distance, VectorParams, Batch, Datatype,
     Filter, FieldCondition, MatchValue,
-    SearchParams
+    SearchParams, QuantizationSearchParams, QueryRequest,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    HnswConfigDiff, OptimizersConfigDiff
 )
-from typing import List, Dict
+from code_chunker import Chunk
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Union
+import hashlib
+import os
+import threading
 import uuid
 import numpy as np
 
 
+# One client per (server, transport) within a process: CodeVectorDB
+# instances created in the same process reuse its connection pool
+_POOL: Dict[tuple, QdrantClient] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _get_client(path: str, prefer_grpc: bool, grpc_port: int) -> QdrantClient:
+    """Return the shared QdrantClient for this server, creating it once"""
+    key = (path, prefer_grpc, grpc_port)
+    with _POOL_LOCK:
+        client = _POOL.get(key)
+        if client is None:
+            client = QdrantClient(url=path, prefer_grpc=prefer_grpc, grpc_port=grpc_port)
+            _POOL[key] = client
+        return client
+
+
 class CodeVectorDB:
     """
     Vector database for code search using Qdrant
@@ -31,30 +57,100 @@ class CodeVectorDB:
     - Score thresholds for quality
     """
 
-    def __init__(self, path: str = "http://localhost:6333", collection_name: str = "elixir_code"):
+    # Payload fields filtered on by search (keyword indexes)
+    PAYLOAD_INDEXES = ("repo", "module", "type")
+
+    def __init__(
+        self,
+        path: str = "http://localhost:6333",
+        collection_name: str = "elixir_code",
+        prefer_grpc: bool = None,
+        grpc_port: int = 6334,
+        include_extended_payload: bool = True
+    ):
         """
         Initialize Qdrant vector database
 
         Args:
             path: Server URL (use URL like "http://localhost:6333" for hosted)
             collection_name: Name of the collection
+            prefer_grpc: Talk gRPC/protobuf instead of REST/JSON - less
+                        per-request overhead on searches (default:
+                        QDRANT_PREFER_GRPC env var; needs grpc_port published)
+            grpc_port: Qdrant gRPC port
+            include_extended_payload: Store each chunk's `functions` and
+                        `metadata` (used by reranking and the prompt); turn
+                        off to store only text, file, repo, type and module
         """
-        # Use url parameter for server connection
-        self.client = QdrantClient(url=path)
+        if prefer_grpc is None:
+            prefer_grpc = os.getenv('QDRANT_PREFER_GRPC', '').lower() == 'true'
+
+        # Use url parameter for server connection (shared per server)
+        self.client = _get_client(path, prefer_grpc, grpc_port)
         self.collection_name = collection_name
+        self.include_extended_payload = include_extended_payload
 
-        print(f"Initialized Qdrant at {path}")
+        print(f"Initialized Qdrant at {path}" + (f" (gRPC :{grpc_port})" if prefer_grpc else ""))
 
-    def create_collection(self, embedding_dim: int = 768, reset: bool = True):
+    def create_collection(
+        self,
+        embedding_dim: int = 768,
+        reset: bool = True,
+        quantization: str = "scalar",
+        datatype: str = "float16",
+        hnsw_config: HnswConfigDiff = None,
+        optimizers_config: OptimizersConfigDiff = None,
+        on_disk_payload: bool = True
+    ):
         """
         Create collection with optimal settings for code search
 
-        Distance metric: COSINE is best for semantic similarity
+        Distance metric: DOT. Embeddings are normalized at encode time, so
+        the dot product equals cosine similarity without the per-comparison
+        norm computation.
+
+        Quantization: "scalar" keeps an int8 copy of every vector in RAM
+        (4x smaller than float32) for the HNSW walk; the original vectors
+        stay on record so search can rescore the candidates exactly.
+        "binary" keeps 1 bit per dimension instead (32x smaller, 96 bytes
+        for 768 dims) - fastest, and relies on the rescore step for recall.
 
         Args:
             embedding_dim: Dimension of embeddings
-            reset: Whether to delete existing collection
+            reset: Whether to delete existing collection (False reuses a
+                  matching one and only adds missing payload indexes)
+            quantization: "scalar" (int8), "binary" (1-bit) or None to store float32 only
+            datatype: Storage precision of the original vectors, "float16"
+                     (half the size; embedding models don't carry more
+                     precision than that) or "float32"
+            hnsw_config: HNSW graph settings (default: m=32, ef_construct=256 -
+                        a denser, better-built graph for a read-heavy index,
+                        so search can use a lower hnsw_ef)
+            optimizers_config: Segment optimizer settings (default: build
+                              the HNSW index once a segment passes 20 MB)
+            on_disk_payload: Keep payloads (the full chunk text) on disk and
+                            let mmap cache the hot pages, instead of holding
+                            every chunk in RAM. Indexed fields stay in memory
         """
+        if hnsw_config is None:
+            # full_scan_threshold is in KB: below ~10 MB a filtered search
+            # just scans instead of walking the graph
+            hnsw_config = HnswConfigDiff(m=32, ef_construct=256, full_scan_threshold=10000)
+        if optimizers_config is None:
+            optimizers_config = OptimizersConfigDiff(indexing_threshold=20000)
+
+        if not reset and self.client.collection_exists(self.collection_name):
+            info = self.client.get_collection(self.collection_name)
+            existing_dim = info.config.params.vectors.size
+            if existing_dim != embedding_dim:
+                raise ValueError(
+                    f"Collection {self.collection_name} has dim={existing_dim}, "
+                    f"expected {embedding_dim}; pass reset=True to recreate it"
+                )
+            self._ensure_payload_indexes(existing=info.payload_schema or {})
+            print(f"✓ Using existing collection: {self.collection_name} (dim={embedding_dim})")
+            return
+
         if reset:
             try:
                 self.client.delete_collection(self.collection_name)
@@ -66,66 +162,114 @@ class CodeVectorDB:
             collection_name=self.collection_name,
             vectors_config=VectorParams(
                 size=embedding_dim,
-                distance=Distance.COSINE,  # Best for code similarity
+                distance=Distance.DOT,  # Cosine on pre-normalized vectors
+                # Quantized copy is searched in RAM; the float32 originals
+                # are only read to rescore candidates, so they can be mmapped
+                on_disk=quantization is not None,
+                datatype=Datatype(datatype),
             ),
+            quantization_config=self._quantization_config(quantization),
+            hnsw_config=hnsw_config,
+            optimizers_config=optimizers_config,
+            on_disk_payload=on_disk_payload,
         )
 
         # Create payload indexes for fast filtering
-        self.client.create_payload_index(
-            collection_name=self.collection_name,
-            field_name="repo",
-            field_schema="keyword"
-        )
-
-        self.client.create_payload_index(
-            collection_name=self.collection_name,
-            field_name="module",
-            field_schema="keyword"
-        )
-
-        self.client.create_payload_index(
-            collection_name=self.collection_name,
-            field_name="type",
-            field_schema="keyword"
-        )
+        self._ensure_payload_indexes()
 
         print(f"✓ Created collection: {self.collection_name} (dim={embedding_dim})")
 
-    def index_chunks(self, chunks: List[Dict], embeddings: np.ndarray, batch_size: int = 100):
+    def _ensure_payload_indexes(self, existing=()):
+        """Create the keyword indexes used for filtering, skipping existing ones"""
+        for field_name in self.PAYLOAD_INDEXES:
+            if field_name in existing:
+                continue
+            try:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema="keyword"
+                )
+            except Exception as e:
+                # Another writer may have created it in the meantime
+                if "already exists" not in str(e).lower():
+                    raise
+
+    @staticmethod
+    def _quantization_config(quantization: str):
+        """Map a quantization name to its Qdrant config"""
+        if quantization is None:
+            return None
+        if quantization == "scalar":
+            return ScalarQuantization(
+                # quantile=0.99 clips outlier components so int8 keeps
+                # resolution where the values actually are
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if quantization == "binary":
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            )
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    def index_chunks(
+        self,
+        chunks: List[Chunk],
+        embeddings: np.ndarray,
+        batch_size: int = 256,
+        parallel: int = 4
+    ):
         """
         Index chunks with embeddings into Qdrant
 
+        Batches are upserted from a small thread pool so client-side
+        serialization, the network and server-side writes overlap.
+
         Args:
             chunks: List of code chunks
             embeddings: Corresponding embeddings
             batch_size: Batch size for upload
+            parallel: Concurrent upsert requests (Qdrant gains little past ~4)
         """
-        points = []
-
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point = PointStruct(
-                id=str(uuid.uuid4()),  # Use UUID for unique IDs
-                vector=embedding.tolist(),
-                payload={
-                    'text': chunk['text'],
-                    'file': str(chunk['file']),
-                    'repo': chunk['repo'],
-                    'type': chunk['type'],
-                    'module': chunk.get('module', ''),
-                    'functions': chunk.get('functions', []),
-                    'metadata': chunk.get('metadata', {}),
-                }
-            )
-            points.append(point)
-
-        # Upload in batches
-        for i in range(0, len(points), batch_size):
-            batch = points[i:i + batch_size]
+        # Columnar batches (ids / vectors / payloads) instead of one
+        # PointStruct per chunk
+        ids = [self._point_id(chunk) for chunk in chunks]
+        # One contiguous float32 buffer for the whole call; sliced per batch
+        vectors = self._normalize(embeddings)
+        payloads = [
+            {
+                'text': chunk.text,
+                'file': str(chunk.file),
+                'repo': chunk.repo,
+                'type': chunk.type,
+                'module': chunk.module or '',
+            }
+            for chunk in chunks
+        ]
+        if self.include_extended_payload:
+            for payload, chunk in zip(payloads, chunks):
+                payload['functions'] = chunk.functions or []
+                payload['metadata'] = chunk.metadata or {}
+
+        # Upload in batches, several in flight at once. Each worker
+        # converts its own slice, so only in-flight batches exist as
+        # Python lists at any moment
+        def upload(start):
             self.client.upsert(
                 collection_name=self.collection_name,
-                points=batch
+                points=Batch(
+                    ids=ids[start:start + batch_size],
+                    vectors=vectors[start:start + batch_size].tolist(),  # one C-level conversion per batch
+                    payloads=payloads[start:start + batch_size]
+                )
             )
-            print(f"Uploaded batch {i//batch_size + 1}/{(len(points)-1)//batch_size + 1}")
+
+        starts = range(0, len(ids), batch_size)
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(starts)))) as executor:
+            futures = [executor.submit(upload, start) for start in starts]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()  # Re-raise upload errors
+                print(f"Uploaded batch {done}/{len(starts)}")
 
         print(f"✓ Indexed {len(chunks)} chunks")
 
@@ -135,7 +279,9 @@ class CodeVectorDB:
         limit: int = 5,
         repo_filter: str = None,
         module_filter: str = None,
-        score_threshold: float = 0.5
+        score_threshold: float = 0.5,
+        exact: bool = False,
+        payload: Union[bool, List[str]] = True
     ) -> List:
         """
         Search with optional filtering
@@ -146,11 +292,140 @@ class CodeVectorDB:
             repo_filter: Filter by repository name
             module_filter: Filter by module name
             score_threshold: Minimum similarity score (0-1)
+            exact: Brute-force scan instead of HNSW (faster on small collections)
+            payload: True for full payloads, False for ids and scores only,
+                    or a list of payload fields - oversampled candidates
+                    can skip the chunk text and be hydrate()d later
 
         Returns:
             List of search results with scores and payloads
         """
-        # Build filter
+        # Search
+        results = self.client.query_points(
+            collection_name=self.collection_name,
+            query=self._normalize(query_vector).tolist(),
+            limit=limit,
+            query_filter=self._build_filter(repo_filter, module_filter),
+            score_threshold=score_threshold,
+            search_params=self._search_params(exact),
+            with_payload=payload,
+            with_vectors=False
+        )
+
+        return results
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        limit: int = 5,
+        repo_filter: str = None,
+        module_filter: str = None,
+        score_threshold: float = 0.5,
+        exact: bool = False,
+        filters: List[Dict] = None,
+        payload: Union[bool, List[str]] = True
+    ) -> List:
+        """
+        Run several searches in one request (query_batch_points)
+
+        Args:
+            query_vectors: (n, d) query embeddings
+            limit: Number of results per query
+            repo_filter: Filter by repository name (shared by all queries)
+            module_filter: Filter by module name (shared by all queries)
+            score_threshold: Minimum similarity score (0-1)
+            exact: Brute-force scan instead of HNSW
+            filters: Per-query filters instead of the shared ones, one
+                    {'repo': ..., 'module': ...} dict (or None) per vector -
+                    e.g. the same question against several repos
+            payload: True, False or a list of payload fields (see search)
+
+        Returns:
+            One result (with .points) per query vector, in order
+        """
+        query_vectors = self._normalize(query_vectors)
+        search_params = self._search_params(exact)
+
+        if filters is None:
+            search_filters = [self._build_filter(repo_filter, module_filter)] * len(query_vectors)
+        else:
+            if len(filters) != len(query_vectors):
+                raise ValueError("filters must have one entry per query vector")
+            search_filters = [
+                self._build_filter((f or {}).get('repo'), (f or {}).get('module'))
+                for f in filters
+            ]
+
+        requests = [
+            QueryRequest(
+                query=vector.tolist(),
+                limit=limit,
+                filter=search_filter,
+                score_threshold=score_threshold,
+                params=search_params,
+                with_payload=payload,
+                with_vector=False
+            )
+            for vector, search_filter in zip(query_vectors, search_filters)
+        ]
+
+        return self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=requests
+        )
+
+    def hydrate(self, ids: List, fields: List[str] = None) -> Dict:
+        """
+        Fetch payloads for a set of point IDs in one request
+
+        Args:
+            ids: Point IDs (e.g. the final top-k after reranking)
+            fields: Payload fields to fetch (default: all)
+
+        Returns:
+            Dict mapping point ID to its payload
+        """
+        if not ids:
+            return {}
+
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_payload=fields or True,
+            with_vectors=False
+        )
+        return {record.id: record.payload for record in records}
+
+    @staticmethod
+    def _point_id(chunk: Chunk) -> str:
+        """
+        Stable point ID derived from the chunk's location and content
+
+        Re-indexing unchanged code overwrites the same points instead of
+        adding duplicates, and hashing is cheaper than uuid4's urandom call.
+        """
+        digest = hashlib.blake2b(
+            f"{chunk.repo}\0{chunk.file}\0{chunk.type}\0{chunk.module}\0{chunk.text}".encode('utf-8'),
+            digest_size=16
+        ).digest()
+        return str(uuid.UUID(bytes=digest))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """
+        L2-normalize vectors (rows of a matrix, or a single vector)
+
+        The collection uses DOT distance, which only equals cosine for unit
+        vectors. HybridCodeEmbedder already normalizes, so this is a cheap
+        no-op there; it protects against vectors from anywhere else.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _build_filter(repo_filter: str = None, module_filter: str = None):
+        """Payload filter for the optional repo/module restrictions"""
         filter_conditions = []
 
         if repo_filter:
@@ -163,23 +438,19 @@ class CodeVectorDB:
                 FieldCondition(key="module", match=MatchValue(value=module_filter))
             )
 
-        search_filter = Filter(must=filter_conditions) if filter_conditions else None
-
-        # Search
-        results = self.client.query_points(
-            collection_name=self.collection_name,
-            query=query_vector.tolist(),
-            limit=limit,
-            query_filter=search_filter,
-            score_threshold=score_threshold,
-            search_params=SearchParams(
-                hnsw_ef=128,  # Higher = better quality, slower
-                exact=False   # Set True for exact search (slower)
-            )
+        return Filter(must=filter_conditions) if filter_conditions else None
+
+    @staticmethod
+    def _search_params(exact: bool = False) -> SearchParams:
+        """HNSW/quantization settings used by every search"""
+        return SearchParams(
+            hnsw_ef=64,  # Higher = better quality, slower; 64 is plenty for k <= 20
+            exact=exact,  # Full scan: exact results, only faster on small collections
+            # Walk the graph on quantized vectors, then rescore the
+            # oversampled candidates with the original float32 ones
+            quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
         )
 
-        return results
-
     def get_stats(self) -> Dict:
         """Get collection statistics"""
         info = self.client.get_collection(self.collection_name)
@@ -198,16 +469,17 @@ if __name__ == "__main__":
 
     # Test data
     test_chunks = [
-        {
-            'text': 'def hello, do: "world"',
-            'file': 'test.ex',
-            'repo': 'test_repo',
-            'type': 'module'
-        }
+        Chunk(
+            text='def hello, do: "world"',
+            file='test.ex',
+            repo='test_repo',
+            type='module'
+        )
     ]
 
-    # Mock embeddings
-    test_embeddings = np.random.randn(1, 384)
+    # Mock embeddings: float32 and unit-length, like HybridCodeEmbedder output
+    test_embeddings = np.random.randn(1, 384).astype(np.float32)
+    test_embeddings /= np.linalg.norm(test_embeddings, axis=1, keepdims=True)
 
     # Index
     db.index_chunks(test_chunks, test_embeddings)
@@ -216,7 +488,8 @@ if __name__ == "__main__":
     stats = db.get_stats()
     print(f"\nCollection stats: {stats}")
 
-    # Search
-    query_vector = np.random.randn(384)
-    results = db.query_points(query_vector, limit=1)
-    print(f"Search results: {len(results)} found")
+    # Search (random vectors score near 0, so no threshold)
+    query_vector = np.random.randn(384).astype(np.float32)
+    query_vector /= np.linalg.norm(query_vector)
+    results = db.search(query_vector, limit=1, score_threshold=None)
+    print(f"Search results: {len(results.points)} found")
@@ -8,12 +8,15 @@ Run with: streamlit run web_ui.py
 """
 
 import streamlit as st
+import atexit
 import os
 import sys
 from pathlib import Path
 import json
-import subprocess
+import queue
+import threading
 import time
+import uuid
 from datetime import datetime
 import requests
 
@@ -25,8 +28,48 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Index-time vector compression (CodeVectorDB.create_collection quantization)
+QUANTIZATION_OPTIONS = {
+    "int8 (4x smaller, recommended)": "scalar",
+    "binary (32x smaller, fastest)": "binary",
+    "none (float16 in RAM)": None,
+}
+DEFAULT_QUANTIZATION = next(iter(QUANTIZATION_OPTIONS))
+
+# Canned questions shown on an empty chat (label, question)
+EXAMPLE_QUESTIONS = [
+    ("🔐 Permissions", "How do we handle permissions in our codebase?"),
+    ("⚡ GenServers", "Show me examples of GenServers"),
+    ("💾 Database", "What's our pattern for database queries?"),
+]
+
+# Chat history survives restarts, one file per chat (see get_chat_id);
+# only the newest messages render inline
+CHAT_HISTORY_DIR = "chat_history"
+VISIBLE_MESSAGES = 20
+
+# Context chunks per question unless the sidebar slider says otherwise
+DEFAULT_CONTEXT_CHUNKS = 5
+
+# Answers survive restarts (ElixirRAG's exact + semantic QueryCache, one
+# file per model); so do embeddings, in embeddings.EMBED_CACHE_PATH
+ANSWER_CACHE_DIR = "qdrant_data"
+
+def answer_cache_path(model):
+    """Answer cache file for one LLM (answers differ between models)"""
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+    return os.path.join(ANSWER_CACHE_DIR, f"sem_cache_{safe_name}.npz")
+
+def clear_answer_caches():
+    """Delete every model's saved answers (they describe the old index)"""
+    for path in Path(ANSWER_CACHE_DIR).glob("sem_cache_*.npz"):
+        try:
+            path.unlink()
+        except OSError as e:
+            print(f"⚠ Could not delete {path}: {e}")
+
 # Modern, clean CSS
-st.markdown("""
+_CSS = """
 <style>
     /* Hide Streamlit branding */
     #MainMenu {visibility: hidden;}
@@ -90,50 +133,155 @@ st.markdown("""
         background: rgba(255,255,255,0.05);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+def _inject_css():
+    """
+    Add the stylesheet to the page
+
+    Must run on every rerun: Streamlit rebuilds the element list each
+    time, and an element that is not re-emitted is removed. The frontend
+    diffs identical elements, so the browser does not re-apply it.
+    """
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+_inject_css()
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
+# Streamlit reruns the whole script on every interaction; these checks are
+# cached for a few seconds so a chatty session doesn't hammer Ollama
+
+@st.cache_resource
+def get_http_session():
+    """Keep-alive HTTP session for Ollama API calls, shared by every rerun"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    return session
+
+class OllamaModelPoller:
+    """
+    Ollama liveness and installed model names, refreshed by a daemon thread
+
+    One /api/tags request answers both questions: a response means the
+    server is up, and its body lists the models.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # (running, model names), swapped as one tuple so readers never
+        # see a half-updated pair. First fetch inline so the first page
+        # already knows the models
+        self.state = self._fetch()
+        self._thread = threading.Thread(target=self._run, name="ollama-poller", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @staticmethod
+    def _fetch():
+        try:
+            response = get_http_session().get("http://localhost:11434/api/tags", timeout=2)
+            return True, frozenset(model.get('name', '') for model in response.json().get('models', []))
+        except Exception:
+            return False, frozenset()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.state = self._fetch()
+
+    def refresh(self):
+        """Poll now instead of at the next interval"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+@st.cache_resource(show_spinner=False)
+def get_ollama_poller():
+    """The one model poller per server process"""
+    return OllamaModelPoller()
+
+def probe_ollama():
+    """(running, installed model names) - a lookup, no request on the rerun path"""
+    return get_ollama_poller().state
+
 def check_ollama_running():
     """Check if Ollama is running"""
-    try:
-        response = requests.get("http://localhost:11434", timeout=1)
-        return True
-    except:
-        return False
+    return probe_ollama()[0]
+
+def list_ollama_models():
+    """Names of all installed Ollama models"""
+    return probe_ollama()[1]
 
 def check_ollama_model(model_name):
     """Check if a specific model is available"""
-    try:
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        return model_name in result.stdout
-    except:
-        return False
+    models = list_ollama_models()
+    # Ollama lists untagged pulls as "name:latest"
+    return model_name in models or f"{model_name}:latest" in models
 
+@st.cache_resource(show_spinner=False)
+def get_db(path="http://localhost:6333"):
+    """One CodeVectorDB (and Qdrant connection) shared by every rerun"""
+    from vector_db import CodeVectorDB
+    return CodeVectorDB(path=path, collection_name="elixir_code")
+
+@st.cache_resource(show_spinner=False)
+def get_embedder():
+    """One embedding model for chat and indexing (query embeddings persist across restarts)"""
+    from embeddings import HybridCodeEmbedder, EMBED_CACHE_PATH
+    return HybridCodeEmbedder(persist_path=EMBED_CACHE_PATH)
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """
+    Load the embedding model and touch Qdrant in a background thread
+
+    Runs once per server process. The model load and first forward pass
+    (seconds on CPU) then happen while the user is still reading the
+    page; get_embedder() callers wait for the same instance meanwhile.
+    """
+    def prewarm():
+        try:
+            get_embedder().encode("warmup")
+            db = get_db()
+            db.client.get_collection(db.collection_name)
+        except Exception as e:
+            print(f"⚠ Prewarm skipped: {e}")
+
+    thread = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def read_index_metadata(mtime_ns):
+    """Parsed index_metadata.json, cached per file modification time"""
+    with open('index_metadata.json', 'r') as f:
+        return json.load(f)
+
+@st.cache_data(ttl=5, show_spinner=False)
 def get_index_status():
-    """Get indexing status"""
+    """Get indexing status (cached briefly - the sidebar asks on every rerun)"""
     # Check if server is accessible and has data
     try:
-        from vector_db import CodeVectorDB
-        db = CodeVectorDB()
+        db = get_db()
         stats = db.get_stats()
 
         if stats['total_points'] > 0:
-            # Load metadata if available
-            if os.path.exists('index_metadata.json'):
-                try:
-                    with open('index_metadata.json', 'r') as f:
-                        metadata = json.load(f)
-                    return "indexed", metadata
-                except:
-                    pass
+            # Load metadata if available (parsed again only when the file changes)
+            try:
+                mtime_ns = os.stat('index_metadata.json').st_mtime_ns
+                return "indexed", read_index_metadata(mtime_ns)
+            except (OSError, ValueError):
+                pass
 
             # Return basic status even without metadata
             return "indexed", {'total_chunks': stats['total_points']}
@@ -146,16 +294,31 @@ def get_index_status():
         else:
             return "not_indexed", {}
 
+def current_index_id():
+    """indexed_at of the current index - saved answers are only valid for it"""
+    try:
+        return read_index_metadata(os.stat('index_metadata.json').st_mtime_ns).get('indexed_at')
+    except (OSError, ValueError):
+        return None
+
+def get_point_text(db, point_id):
+    """Fetch just the code text of one point"""
+    points = db.client.retrieve(
+        collection_name=db.collection_name,
+        ids=[point_id],
+        with_payload=["text"],
+        with_vectors=False
+    )
+    return points[0].payload.get('text', '') if points else ''
+
+@st.fragment
 def show_qdrant_viewer():
-    """Show Qdrant database viewer in a modal"""
+    """Show Qdrant database viewer in a modal (its widgets rerun only the viewer)"""
     st.markdown("### 🔍 Qdrant Database Viewer")
     st.markdown("---")
 
     try:
-        from vector_db import CodeVectorDB
-
-        # Connect to server directly
-        db = CodeVectorDB(path="http://localhost:6333")
+        db = get_db()
 
         # Get collection stats
         stats = db.get_stats()
@@ -188,15 +351,18 @@ def show_qdrant_viewer():
         if collection_info.points_count > 0:
             st.markdown("#### 📋 Sample Code Chunks")
 
-            # Get sample points
+            # Get sample points - header fields only, the code text is
+            # usually most of the payload and is fetched per point on demand
             sample_result = db.client.scroll(
                 collection_name=db.collection_name,
                 limit=10,
-                with_payload=True,
+                with_payload=["file", "module", "type", "repo"],
                 with_vectors=False
             )
 
             if sample_result[0]:
+                loaded_texts = st.session_state.setdefault('viewer_texts', {})
+
                 for i, point in enumerate(sample_result[0], 1):
                     with st.expander(f"📁 {point.payload.get('file', f'Chunk {i}')}"):
                         col1, col2 = st.columns([1, 2])
@@ -207,7 +373,11 @@ def show_qdrant_viewer():
                             st.write(f"**Repo:** {point.payload.get('repo', 'N/A')}")
 
                         with col2:
-                            text = point.payload.get('text', '')
+                            # Expander bodies always run, so loading is an explicit click
+                            if point.id not in loaded_texts:
+                                if st.button("📄 Load code", key=f"load_text_{point.id}"):
+                                    loaded_texts[point.id] = get_point_text(db, point.id)
+                            text = loaded_texts.get(point.id, '')
                             if text:
                                 st.code(text[:500] + "..." if len(text) > 500 else text, language='elixir')
             else:
@@ -221,6 +391,7 @@ def show_qdrant_viewer():
 
         with col1:
             if st.button("🔄 Refresh Stats", key="refresh_qdrant"):
+                get_index_status.clear()
                 st.rerun()
 
         with col2:
@@ -228,6 +399,10 @@ def show_qdrant_viewer():
                 if st.session_state.get('confirm_clear', False):
                     try:
                         db.client.delete_collection(db.collection_name)
+                        # Answers (in memory and on disk) came from the deleted code
+                        clear_answer_caches()
+                        load_rag_system.clear()
+                        get_index_status.clear()
                         st.success("Collection cleared successfully!")
                         st.session_state.confirm_clear = False
                         st.rerun()
@@ -269,49 +444,138 @@ def show_qdrant_viewer():
         st.session_state.show_qdrant_viewer = False
         st.rerun()
 
-def run_indexing(repo_paths, progress_callback=None):
-    """Run indexing in background"""
-    from code_chunker import chunk_repository
-    from embeddings import HybridCodeEmbedder
-    from vector_db import CodeVectorDB
+def get_chat_id():
+    """
+    This browser session's chat ID, kept in the URL (?chat=...)
+
+    A reload or bookmark of the same URL restores that conversation; a new
+    session gets a new ID and an empty chat instead of someone else's.
+    """
+    if "chat_id" not in st.session_state:
+        chat_id = st.query_params.get("chat", "")
+        if not (len(chat_id) == 32 and all(c in "0123456789abcdef" for c in chat_id)):
+            chat_id = uuid.uuid4().hex
+            st.query_params["chat"] = chat_id
+        st.session_state.chat_id = chat_id
+    return st.session_state.chat_id
+
+def chat_history_path(chat_id):
+    """History file for one chat"""
+    return os.path.join(CHAT_HISTORY_DIR, f"chat_{chat_id}.json")
+
+def load_chat_history():
+    """Messages saved earlier for this session's chat (empty if none)"""
+    try:
+        with open(chat_history_path(get_chat_id()), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _write_chat_history(path, messages):
+    """Write one chat history atomically (temp file + rename)"""
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(messages, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠ Could not save chat history: {e}")
+
+class ChatHistoryWriter:
+    """
+    Saves chat history snapshots on a background thread
+
+    Each snapshot is a chat's whole history, so only the newest pending
+    one per file matters: a newer submit replaces an unwritten older one
+    instead of queueing behind it, and the chat loop never waits.
+    """
+
+    def __init__(self):
+        # path -> newest unwritten snapshot
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for path, messages in pending.items():
+            _write_chat_history(path, messages)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self._drain()
+            if self._stop.is_set():
+                return
+
+    def submit(self, path, messages):
+        """Queue a snapshot for writing and return immediately"""
+        with self._lock:
+            self._pending[path] = messages
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        """Write whatever is pending, then end the thread"""
+        if not self._thread.is_alive():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            # Anything submitted while the thread was finishing
+            self._drain()
+
+@st.cache_resource(show_spinner=False)
+def get_history_writer():
+    """The one history writer per server process"""
+    return ChatHistoryWriter()
+
+def save_chat_history(messages):
+    """Save this session's chat history without waiting for the disk"""
+    # Copy now: the writer serializes later, while the page keeps appending
+    get_history_writer().submit(chat_history_path(get_chat_id()), [dict(m) for m in messages])
+
+def run_indexing(repo_paths, progress_callback=None, quantization="scalar"):
+    """Run indexing in background (quantization: "scalar", "binary" or None)"""
+    from code_chunker import chunk_repositories
+    from index_hub88 import embed_and_upload
 
     try:
         # Initialize
         if progress_callback:
             progress_callback("Initializing embeddings model...")
 
-        embedder = HybridCodeEmbedder()
-        db = CodeVectorDB(collection_name="elixir_code")
-        db.create_collection(embedding_dim=embedder.embedding_dim)
-
-        # Process repos
-        all_chunks = []
-        for i, repo_path in enumerate(repo_paths):
-            if progress_callback:
-                progress_callback(f"Chunking repository {i+1}/{len(repo_paths)}: {repo_path}")
+        # Same (possibly pre-warmed) model the chat uses; unchanged chunks
+        # reuse their vectors from the last run
+        embedder = get_embedder()
+        hits_before, misses_before = embedder.chunk_hits, embedder.chunk_misses
+        db = get_db()
+        db.create_collection(embedding_dim=embedder.embedding_dim, quantization=quantization)
 
-            chunks = chunk_repository(repo_path)
-            all_chunks.extend(chunks)
-
-        # Generate embeddings
+        # Chunk all repos in one process pool; embed and upload one window
+        # at a time so memory stays bounded
         if progress_callback:
-            progress_callback(f"Generating embeddings for {len(all_chunks)} chunks...")
-
-        texts = [chunk['text'] for chunk in all_chunks]
-        embeddings = embedder.encode_batch(texts, batch_size=32)
+            progress_callback(f"Chunking, embedding and uploading {len(repo_paths)} repositories...")
 
-        # Index
-        if progress_callback:
-            progress_callback("Uploading to vector database...")
-
-        db.index_chunks(all_chunks, embeddings)
+        total_chunks = embed_and_upload(chunk_repositories(repo_paths), embedder, db)
+        reused = embedder.chunk_hits - hits_before
+        embedded = embedder.chunk_misses - misses_before
 
         # Save metadata
         metadata = {
             'repos': repo_paths,
-            'total_chunks': len(all_chunks),
+            'total_chunks': total_chunks,
             'embedding_dim': embedder.embedding_dim,
             'collection_name': 'elixir_code',
+            'quantization': quantization or 'none',
+            'embedding_cache_hit_rate': reused / max(reused + embedded, 1),
             'indexed_at': datetime.now().isoformat()
         }
 
@@ -324,24 +588,32 @@ def run_indexing(repo_paths, progress_callback=None):
         import traceback
         return False, f"{str(e)}\n\n{traceback.format_exc()}"
 
-@st.cache_resource
-def load_rag_system(use_claude=False, claude_api_key=None):
-    """Load RAG system (cached)"""
+@st.cache_resource(show_spinner=False)
+def load_rag_system(use_claude=False, claude_api_key=None, model="codestral"):
+    """
+    Load RAG system (cached)
+
+    One instance per (backend, key, model), shared by every browser
+    session; all of them share the single get_embedder() model and
+    get_db() connection.
+    """
     try:
-        from embeddings import HybridCodeEmbedder
-        from vector_db import CodeVectorDB
         from rag_system import ElixirRAG
 
-        embedder = HybridCodeEmbedder()
-        db = CodeVectorDB(collection_name="elixir_code")
+        embedder = get_embedder()
+        db = get_db()
 
         rag = ElixirRAG(
             vector_db=db,
             embedder=embedder,
-            model=os.getenv('OLLAMA_MODEL', 'codestral'),
+            model=model,
             use_claude=use_claude,
             claude_api_key=claude_api_key
         )
+        try:
+            rag.cache.load(answer_cache_path("claude" if use_claude else model), tag=current_index_id())
+        except Exception as e:
+            print(f"⚠ Could not load answer cache ({e})")
 
         return rag, None
     except Exception as e:
@@ -349,15 +621,78 @@ def load_rag_system(use_claude=False, claude_api_key=None):
         error_detail = f"{str(e)}\n\n{traceback.format_exc()}"
         return None, error_detail
 
+start_prewarm()
+
+class ExampleWarmer:
+    """
+    Answers EXAMPLE_QUESTIONS ahead of the click on one background thread
+
+    Local Ollama only, and only with the default settings (DEFAULT_CONTEXT_CHUNKS,
+    no repo filter), once per model: moving the sliders doesn't start more
+    generations competing with real questions. The answers land in the RAG
+    answer cache, so clicking an example returns instantly; a click while
+    warm-up is still on that question waits for the same answer instead
+    of starting another one.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._requested = set()
+        self._thread = threading.Thread(target=self._run, name="warm-examples", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            model = self._queue.get()
+            if model is None:
+                return
+            self._warm(model)
+
+    @staticmethod
+    def _warm(model):
+        rag, error = load_rag_system(use_claude=False, claude_api_key=None, model=model)
+        if error:
+            return
+        try:
+            for _, question in EXAMPLE_QUESTIONS:
+                # Same (k, repo_filter) scope as chat_fragment with an empty
+                # filter box, or the clicks would never hit these answers
+                rag.query(question, k=DEFAULT_CONTEXT_CHUNKS, repo_filter=None, verbose=False)
+            rag.cache.save(answer_cache_path(model))
+        except Exception as e:
+            print(f"⚠ Example warm-up stopped: {e}")
+
+    def request(self, model):
+        """Queue model for warm-up unless it was already requested"""
+        with self._lock:
+            if model in self._requested:
+                return
+            self._requested.add(model)
+        self._queue.put(model)
+
+    def forget(self):
+        """Warm every model again on its next request (e.g. after re-indexing)"""
+        with self._lock:
+            self._requested.clear()
+
+    def stop(self):
+        """End the worker after the model it is on"""
+        self._queue.put(None)
+
+@st.cache_resource(show_spinner=False)
+def get_example_warmer():
+    """The one example warmer per server process"""
+    return ExampleWarmer()
+
 # ============================================================================
 # Sidebar - System Status & Settings
 # ============================================================================
 
-with st.sidebar:
-    st.markdown("### 🧪 Elixir AI")
-    st.markdown("---")
-
-    # System Status
+@st.fragment(run_every="5s")
+def status_panel():
+    """Sidebar status lights, refreshed on a timer without rerunning the app"""
     st.markdown("### 📊 System Status")
 
     # Check Ollama
@@ -393,6 +728,23 @@ with st.sidebar:
 
     st.markdown("---")
 
+    # The main page is laid out from these; only redraw it when they flip
+    seen = (ollama_running, index_status)
+    if st.session_state.setdefault('status_seen', seen) != seen:
+        st.session_state.status_seen = seen
+        st.rerun()
+
+with st.sidebar:
+    st.markdown("### 🧪 Elixir AI")
+    st.markdown("---")
+
+    # Cached checks; the status fragment keeps them fresh between reruns
+    ollama_running = check_ollama_running()
+    index_status, index_metadata = get_index_status()
+    st.session_state.status_seen = (ollama_running, index_status)
+
+    status_panel()
+
     # LLM Selection
     st.markdown("### 🤖 AI Model")
 
@@ -417,7 +769,6 @@ with st.sidebar:
             ["llama3.2:3b", "llama3", "mistral", "deepseek-coder", "codestral"],
             help="Install: ollama pull [model]"
         )
-        os.environ['OLLAMA_MODEL'] = ollama_model
 
         # Check if model exists
         if ollama_running and not check_ollama_model(ollama_model):
@@ -432,7 +783,7 @@ with st.sidebar:
         "Context Chunks",
         min_value=1,
         max_value=10,
-        value=5,
+        value=DEFAULT_CONTEXT_CHUNKS,
         help="More chunks = more context, slower"
     )
 
@@ -442,6 +793,22 @@ with st.sidebar:
         help="Optional: search specific repo"
     )
 
+    answer_similarity = st.slider(
+        "Answer Reuse Similarity",
+        min_value=0.85,
+        max_value=1.0,
+        value=0.97,
+        step=0.01,
+        help="Reuse a previous answer when a question is at least this similar (1.0 = exact repeats only)"
+    )
+
+    embed_stats = st.session_state.get('embed_cache_stats')
+    if embed_stats:
+        st.caption(
+            f"Query embedding cache: {embed_stats['hits']} memory / "
+            f"{embed_stats['disk_hits']} disk hits, {embed_stats['misses']} misses"
+        )
+
     st.markdown("---")
 
     # Actions
@@ -449,6 +816,7 @@ with st.sidebar:
     with col1:
         if st.button("🏠 Home", use_container_width=True):
             st.session_state.messages = []
+            save_chat_history([])
             st.session_state.show_help = False
             st.session_state.show_qdrant_viewer = False
             st.rerun()
@@ -456,10 +824,18 @@ with st.sidebar:
     with col2:
         if st.button("🔄 Clear Chat", use_container_width=True):
             st.session_state.messages = []
+            save_chat_history([])
             st.rerun()
 
     if st.button("🔄 Reload System", use_container_width=True):
+        # The poller and history writer are recreated below; stop the
+        # old threads first (the writer flushes any pending save)
+        get_ollama_poller().stop()
+        get_history_writer().stop()
+        get_example_warmer().stop()
         st.cache_resource.clear()
+        # Re-read the index now rather than when the TTL lapses
+        get_index_status.clear()
         st.success("Cache cleared! System will reload on next query.")
 
     if st.button("📖 Help", use_container_width=True):
@@ -492,6 +868,140 @@ with st.sidebar:
     if st.button("🔍 View Qdrant DB", use_container_width=True, help="View database statistics and sample data"):
         st.session_state.show_qdrant_viewer = True
 
+@st.fragment
+def chat_fragment(use_claude, claude_key, ollama_model, num_chunks, repo_filter, answer_similarity):
+    """
+    Chat history, input and answering
+
+    Typing and sending a message rerun only this fragment, so the
+    sidebar probes and the rest of the page aren't redone every turn.
+    Arguments are the sidebar settings from the last full run.
+    """
+    # Initialize chat history (restored from disk when the URL names an earlier chat)
+    if "messages" not in st.session_state:
+        st.session_state.messages = load_chat_history()
+
+    # A click mid-answer (Stop or anything else) ends that script run;
+    # keep what had streamed so far instead of dropping it
+    if "partial_answer" in st.session_state:
+        partial = st.session_state.pop("partial_answer")
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": (partial + "\n\n*⏹ Stopped*") if partial else "*⏹ Stopped*"
+        })
+        save_chat_history(st.session_state.messages)
+
+    # Example questions (only show if no messages)
+    if not st.session_state.messages:
+        st.markdown("### 💡 Try asking:")
+
+        # Answer them ahead of the click (free on a local model)
+        if not use_claude:
+            get_example_warmer().request(ollama_model)
+
+        col1, col2, col3 = st.columns(3)
+
+        for col, (label, question) in zip([col1, col2, col3], EXAMPLE_QUESTIONS):
+            with col:
+                if st.button(label, use_container_width=True):
+                    st.session_state.example_question = question
+
+    st.markdown("---")
+
+    # Display chat history - the newest messages only, so each rerun's
+    # render cost doesn't grow with the conversation
+    messages = st.session_state.messages
+    earlier = messages[:-VISIBLE_MESSAGES]
+    if earlier and st.toggle(f"Show {len(earlier)} earlier messages", key="show_earlier"):
+        for message in earlier:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+
+    for message in messages[-VISIBLE_MESSAGES:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    # Handle example question
+    if "example_question" in st.session_state:
+        prompt = st.session_state.example_question
+        del st.session_state.example_question
+    else:
+        # Chat input - always show at bottom
+        prompt = st.chat_input("Ask about your Elixir code...")
+
+    # Process message
+    if prompt:
+        # Add user message
+        st.session_state.messages.append({"role": "user", "content": prompt})
+
+        with st.chat_message("user"):
+            st.markdown(prompt)
+
+        # Generate response
+        with st.chat_message("assistant"):
+            try:
+                # Load RAG
+                with st.spinner("Loading models..."):
+                    rag, error = load_rag_system(
+                        use_claude=use_claude,
+                        claude_api_key=claude_key,
+                        model=ollama_model or "codestral"
+                    )
+
+                if error:
+                    st.error(f"**Error loading RAG system:**")
+                    st.code(error, language="text")
+                    st.info("💡 Try clicking **🔄 Reload System** in the sidebar")
+                    answer = f"Error: {error}"
+                else:
+                    stop_event = threading.Event()
+                    st.button("⏹ Stop", key="stop_answer", on_click=stop_event.set)
+
+                    def tokens():
+                        # Mirror progress into session state (see partial_answer above)
+                        parts = []
+                        st.session_state.partial_answer = ""
+                        for text in rag.stream_query(
+                            prompt,
+                            k=num_chunks,
+                            repo_filter=repo_filter,
+                            stop_event=stop_event,
+                            similarity=answer_similarity
+                        ):
+                            parts.append(text)
+                            st.session_state.partial_answer = "".join(parts)
+                            yield text
+
+                    # Query - tokens render as they arrive
+                    answer = st.write_stream(tokens())
+                    st.session_state.pop("partial_answer", None)
+
+                    st.session_state.embed_cache_stats = rag.embedder.cache_stats()
+                    # Only writes when a new answer was cached. A failed save
+                    # must not replace the answer the user just watched stream
+                    try:
+                        rag.cache.save(answer_cache_path("claude" if use_claude else ollama_model))
+                    except Exception as e:
+                        print(f"⚠ Could not save answer cache ({e})")
+
+            except Exception as e:
+                import traceback
+                st.session_state.pop("partial_answer", None)
+                error_msg = f"**Error:** {str(e)}\n\n```\n{traceback.format_exc()}\n```"
+                st.error(error_msg)
+                st.info("💡 Try clicking **🔄 Reload System** in the sidebar")
+                answer = error_msg
+
+            # Save to history
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer
+            })
+            save_chat_history(st.session_state.messages)
+
+            # Rerun just the chat to show the input again
+            st.rerun(scope="fragment")
+
 # ============================================================================
 # Main Content
 # ============================================================================
@@ -581,6 +1091,13 @@ elif st.session_state.get('show_help', False) or index_status in ["not_indexed",
         if valid_paths:
             st.success(f"✓ {len(valid_paths)} valid repository path(s)")
 
+            st.selectbox(
+                "Vector Compression",
+                list(QUANTIZATION_OPTIONS),
+                key="quantization_choice",
+                help="Quantized vectors are searched in RAM and rescored against float16 originals kept on disk"
+            )
+
             if st.button("🚀 Start Indexing", type="primary", use_container_width=True):
                 st.session_state.indexing = True
                 st.rerun()
@@ -598,7 +1115,11 @@ elif st.session_state.get('show_help', False) or index_status in ["not_indexed",
                 status_text.markdown(f"**{message}**")
 
             # Run indexing
-            success, result = run_indexing(valid_paths, update_progress)
+            success, result = run_indexing(
+                valid_paths,
+                update_progress,
+                quantization=QUANTIZATION_OPTIONS[st.session_state.get('quantization_choice', DEFAULT_QUANTIZATION)]
+            )
 
             progress_bar.progress(100)
 
@@ -607,8 +1128,12 @@ elif st.session_state.get('show_help', False) or index_status in ["not_indexed",
                 st.json(result)
                 st.balloons()
 
-                # Clear cache so RAG reloads with new index
-                st.cache_resource.clear()
+                # Rebuild the RAG for the new index (the model stays loaded),
+                # without the answers saved against the old one
+                clear_answer_caches()
+                load_rag_system.clear()
+                get_example_warmer().forget()
+                get_index_status.clear()
 
                 time.sleep(2)
                 st.session_state.indexing = False
@@ -704,91 +1229,14 @@ elif index_status == "indexed":
         else:
             st.stop()  # Stop only if not retrying
 
-    # Initialize chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Example questions (only show if no messages)
-    if not st.session_state.messages:
-        st.markdown("### 💡 Try asking:")
-
-        col1, col2, col3 = st.columns(3)
-
-        examples = [
-            ("🔐 Permissions", "How do we handle permissions in our codebase?"),
-            ("⚡ GenServers", "Show me examples of GenServers"),
-            ("💾 Database", "What's our pattern for database queries?"),
-        ]
-
-        for col, (label, question) in zip([col1, col2, col3], examples):
-            with col:
-                if st.button(label, use_container_width=True):
-                    st.session_state.example_question = question
-
-    st.markdown("---")
-
-    # Display chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-
-    # Handle example question
-    if "example_question" in st.session_state:
-        prompt = st.session_state.example_question
-        del st.session_state.example_question
-    else:
-        # Chat input - always show at bottom
-        prompt = st.chat_input("Ask about your Elixir code...")
-
-    # Process message
-    if prompt:
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
-
-        with st.chat_message("user"):
-            st.markdown(prompt)
-
-        # Generate response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    # Load RAG
-                    rag, error = load_rag_system(
-                        use_claude=use_claude,
-                        claude_api_key=claude_key if use_claude else None
-                    )
-
-                    if error:
-                        st.error(f"**Error loading RAG system:**")
-                        st.code(error, language="text")
-                        st.info("💡 Try clicking **🔄 Reload System** in the sidebar")
-                        answer = f"Error: {error}"
-                    else:
-                        # Query
-                        answer = rag.query(
-                            prompt,
-                            k=num_chunks,
-                            repo_filter=repo_filter if repo_filter else None,
-                            verbose=False
-                        )
-
-                        st.markdown(answer)
-
-                except Exception as e:
-                    import traceback
-                    error_msg = f"**Error:** {str(e)}\n\n```\n{traceback.format_exc()}\n```"
-                    st.error(error_msg)
-                    st.info("💡 Try clicking **🔄 Reload System** in the sidebar")
-                    answer = error_msg
-
-                # Save to history
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": answer
-                })
-
-                # Force rerun to show chat input again
-                st.rerun()
+    chat_fragment(
+        use_claude=use_claude,
+        claude_key=claude_key if use_claude else None,
+        ollama_model=None if use_claude else ollama_model,
+        num_chunks=num_chunks,
+        repo_filter=repo_filter if repo_filter else None,
+        answer_similarity=answer_similarity
+    )
 
 else:
     st.error("Unknown index status. Try re-indexing your code.")